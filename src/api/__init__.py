@@ -1,4 +1,5 @@
 __title__ = "API"
 __version__ = "1.0.0"
 
-from .mod import ModApi
\ No newline at end of file
+from .mod import ModApi, ItemResponse
+from .reconcile import ReconcileModCache
\ No newline at end of file
@@ -1,21 +1,65 @@
-from requests import get, delete, request, Response
+from requests import Session, Response
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlencode
 
 from debugger import debugMsg
 
 import json
+import time
+
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+class ItemResponse():
+    # The result of one item in a batch request. Mirrors the parts of a requests Response we use.
+    status_code: int = None
+    body: any = None
+    
+    def __init__(self, status_code: int, body: any = None):
+        self.status_code = status_code
+        self.body = body
+        
+    @property
+    def text(self) -> str:
+        return json.dumps(self.body)
+    
+    def json(self) -> any:
+        return self.body
 
 class ModApi():
     cfg: dict[str, any] = None
     
     host = "http://localhost"
     endPoint = "/api/content/mod"
+    lookupEndPoint = "/api/content/mod/lookup"
+    batchEndPoint = "/api/content/mod/batch"
     token: str = None
     
     headers: dict[str, str] = {
         "Content-Type": "application/json"
     }
     
+    session: Session = None
+    
+    poolSize: int = 10
+    connectTimeout: int = 5
+    readTimeout: int = 30
+    retries: int = 3
+    retryBackoff: float = 0.5
+    
+    batchSize: int = 50
+    
+    # None until the first batch request tells us whether the server supports batching.
+    batchSupported: bool = None
+    
+    # A 404 may come from a proxy in front of the API. Only give up on batching after this many in a row.
+    batchNotFoundMax: int = 3
+    batchNotFound: int = 0
+    
+    # Longest Retry-After we're willing to wait on in seconds.
+    retryAfterMax: float = 120
+    
     def __init__(self, cfg: dict[str, any]):
         self.cfg = cfg
         
@@ -29,6 +73,49 @@ class ModApi():
             
         if self.token is not None:
             self.headers["Authorization"] = self.token
+            
+        if "poolSize" in apiInfo:
+            self.poolSize = int(apiInfo["poolSize"])
+            
+        if "connectTimeout" in apiInfo:
+            self.connectTimeout = apiInfo["connectTimeout"]
+            
+        if "readTimeout" in apiInfo:
+            self.readTimeout = apiInfo["readTimeout"]
+            
+        if "retries" in apiInfo:
+            self.retries = int(apiInfo["retries"])
+            
+        if "retryBackoff" in apiInfo:
+            self.retryBackoff = float(apiInfo["retryBackoff"])
+            
+        if "batchSize" in apiInfo:
+            self.batchSize = max(1, int(apiInfo["batchSize"]))
+            
+        self.session = self.newSession()
+        
+    def newSession(self) -> Session:
+        # Only idempotent calls are retried on error responses. Adding a mod through POST is retried on connection errors alone.
+        retry = Retry(
+            total = self.retries,
+            backoff_factor = self.retryBackoff,
+            status_forcelist = [429, 500, 502, 503, 504],
+            allowed_methods = ["GET", "PUT", "DELETE"],
+            respect_retry_after_header = True,
+            raise_on_status = False
+        )
+        
+        adapter = HTTPAdapter(pool_connections = self.poolSize, pool_maxsize = self.poolSize, max_retries = retry)
+        
+        session = Session()
+        
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        
+        return session
+    
+    def timeout(self) -> tuple:
+        return (self.connectTimeout, self.readTimeout)
     
     def GetMod(self, id: int = None, srcUrl: str = None, srcQuery: str = None) -> Response:
         if id is None and srcUrl is None and srcQuery is None:
@@ -49,8 +136,9 @@ class ModApi():
         
         debugMsg(self.cfg, 7, f"[API] GetMod() :: Sending request to => '{reqUrl}' with params => '{params}' and headers => '{self.headers}'.")
         
-        resp = get(reqUrl,
-            headers = self.headers                
+        resp = self.session.get(reqUrl,
+            headers = self.headers,
+            timeout = self.timeout()
         )
         
         return resp
@@ -77,6 +165,212 @@ class ModApi():
                 raise Exception("Failed to add mod. Name, URL, or description not set.")
             
         # Set data/body.
+        data = self.BuildModData(
+            url = url,
+            banner = banner,
+            categoryId = categoryId,
+            name = name,
+            ownerName = ownerName,
+            description = description,
+            descriptionShort = descriptionShort,
+            install = install,
+            nsfw = nsfw,
+            autoUpdate = autoUpdate,
+            sources = sources,
+            downloads = downloads,
+            screenshots = screenshots,
+            installers = installers
+        )
+        
+        debugMsg(self.cfg, 8, f"[API] UpdateOrAddMod() :: Sending request to => '{reqUrl}' with data => '{data}' and headers => '{self.headers}'.")
+        
+        # We need to convert data object to JSON.
+        dataJson = json.dumps(data)
+            
+        resp = self.session.request(method, reqUrl,
+            headers = self.headers,
+            data = dataJson,
+            timeout = self.timeout()
+        )
+            
+        return resp
+    
+    def retryDelay(self, resp: Response, attempt: int) -> float:
+        # Retry-After takes priority over our own backoff. It's either seconds or an HTTP date.
+        value = resp.headers.get("Retry-After") if resp is not None else None
+        
+        if value is not None:
+            try:
+                delay = float(value)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = None
+                    
+            if delay is not None:
+                return min(max(0, delay), self.retryAfterMax)
+            
+        return self.retryBackoff * (2 ** attempt)
+    
+    def sendBatch(self, name: str, endPoint: str, items: list[dict[str, any]], idempotent: bool = False) -> list:
+        # Returns a response per item or None if the server doesn't support batching.
+        reqUrl = f"{self.host}{endPoint}"
+        
+        # The session's Retry never retries POST. Throttling means nothing was processed so it's safe to retry any batch. Idempotent batches also retry server errors.
+        retryStatuses = [429, 503]
+        
+        if idempotent:
+            retryStatuses += [500, 502, 504]
+            
+        attempt = 0
+        
+        while True:
+            debugMsg(self.cfg, 7, f"[API] {name}() :: Sending {len(items)} items to => '{reqUrl}'.")
+            
+            resp = None
+            
+            try:
+                resp = self.session.post(reqUrl,
+                    headers = self.headers,
+                    data = json.dumps({ "items": items }),
+                    timeout = self.timeout()
+                )
+            except Exception as e:
+                if not idempotent or attempt >= self.retries:
+                    return [ItemResponse(0, { "message": str(e) }) for _ in items]
+                
+            if resp is not None and (resp.status_code not in retryStatuses or attempt >= self.retries):
+                break
+            
+            delay = self.retryDelay(resp, attempt)
+            
+            debugMsg(self.cfg, 3, f"[API] {name}() :: Retrying batch in {delay:.1f} seconds (status code => {resp.status_code if resp is not None else None}).")
+            
+            time.sleep(delay)
+            
+            attempt += 1
+            
+        if resp.status_code in [405, 501]:
+            debugMsg(self.cfg, 1, f"[API] {name}() :: Server doesn't support batch requests (status code => {resp.status_code}). Falling back to single requests.")
+            
+            self.batchSupported = False
+            
+            return None
+        
+        if resp.status_code == 404:
+            self.batchNotFound += 1
+            
+            if self.batchNotFound >= self.batchNotFoundMax:
+                debugMsg(self.cfg, 1, f"[API] {name}() :: Batch endpoint not found {self.batchNotFound} times in a row. Falling back to single requests.")
+                
+                self.batchSupported = False
+            else:
+                debugMsg(self.cfg, 2, f"[API] {name}() :: Batch endpoint not found. Sending this batch as single requests.")
+                
+            return None
+        
+        if resp.status_code != 200:
+            return [ItemResponse(resp.status_code, { "message": resp.text }) for _ in items]
+        
+        try:
+            data = resp.json()["data"]
+            
+            if len(data) != len(items):
+                raise Exception(f"Expected {len(items)} results, got {len(data)}.")
+        except Exception as e:
+            return [ItemResponse(0, { "message": f"Bad batch response. {e}" }) for _ in items]
+        
+        self.batchSupported = True
+        self.batchNotFound = 0
+        
+        return [ItemResponse(int(item.get("status", 0)), item.get("body")) for item in data]
+    
+    def GetMods(self, sources: list[tuple[str, str]]) -> list:
+        # Looks up (source URL, source query) pairs. Returns a response per pair in the same order.
+        results = []
+        
+        for i in range(0, len(sources), self.batchSize):
+            chunk = sources[i:i + self.batchSize]
+            
+            res = None
+            
+            if self.batchSupported is not False:
+                res = self.sendBatch("GetMods", self.lookupEndPoint, [{ "srcUrl": srcUrl, "srcQuery": srcQuery } for srcUrl, srcQuery in chunk], idempotent = True)
+                
+            if res is None:
+                res = [self.getModSafe(srcUrl, srcQuery) for srcUrl, srcQuery in chunk]
+                
+            results.extend(res)
+            
+        return results
+    
+    def UpdateOrAddMods(self, mods: list[dict[str, any]]) -> list:
+        # Adds or updates mods given as UpdateOrAddMod() arguments. Returns a response per mod in the same order.
+        results = []
+        
+        for i in range(0, len(mods), self.batchSize):
+            chunk = mods[i:i + self.batchSize]
+            
+            res = None
+            
+            if self.batchSupported is not False:
+                res = self.updateOrAddModsBatch(chunk)
+                
+            if res is None:
+                res = [self.updateOrAddModSafe(mod) for mod in chunk]
+                
+            results.extend(res)
+            
+        return results
+    
+    def updateOrAddModsBatch(self, mods: list[dict[str, any]]) -> list:
+        results: list = [None] * len(mods)
+        
+        items = []
+        idxs = []
+        
+        for idx, mod in enumerate(mods):
+            id = mod.get("id")
+            
+            # Apply the same checks as UpdateOrAddMod() before sending anything.
+            if id is None and (not mod.get("name") or not mod.get("url") or not mod.get("description")):
+                results[idx] = ItemResponse(0, { "message": "Failed to add mod. Name, URL, or description not set." })
+                
+                continue
+            
+            item = self.BuildModData(**{ key: value for key, value in mod.items() if key != "id" })
+            
+            if id is not None:
+                item["id"] = id
+                
+            items.append(item)
+            idxs.append(idx)
+            
+        if len(items) > 0:
+            res = self.sendBatch("UpdateOrAddMods", self.batchEndPoint, items)
+            
+            if res is None:
+                return None
+            
+            for idx, resp in zip(idxs, res):
+                results[idx] = resp
+                
+        return results
+    
+    def getModSafe(self, srcUrl: str, srcQuery: str):
+        try:
+            return self.GetMod(None, srcUrl, srcQuery)
+        except Exception as e:
+            return ItemResponse(0, { "message": str(e) })
+        
+    def updateOrAddModSafe(self, mod: dict[str, any]):
+        try:
+            return self.UpdateOrAddMod(**mod)
+        except Exception as e:
+            return ItemResponse(0, { "message": str(e) })
+    
+    def BuildModData(self, url: str = None, banner: str = None, categoryId: int = None, name: str = None, ownerName: str = None, description: str = None, descriptionShort: str = None, install: str = None, nsfw: bool = None, autoUpdate: bool = None, sources: list[dict[str, str]] = None, downloads: list[dict[str, str]] = None, screenshots: list[dict[str, str]] = None, installers: list[dict[str, str]] = None) -> dict[str, any]:
         data: dict[str, any] = {}
         
         if url is not None:
@@ -121,17 +415,7 @@ class ModApi():
         if installers is not None:
             data["installers"] = installers
             
-        debugMsg(self.cfg, 8, f"[API] UpdateOrAddMod() :: Sending request to => '{reqUrl}' with data => '{data}' and headers => '{self.headers}'.")
-        
-        # We need to convert data object to JSON.
-        dataJson = json.dumps(data)
-            
-        resp = request(method, reqUrl,
-            headers = self.headers,
-            data = dataJson
-        )
-            
-        return resp
+        return data
     
     def DeleteMod(self, id: int) -> Response:
         if id is None:
@@ -143,8 +427,9 @@ class ModApi():
         
         debugMsg(self.cfg, 7, f"[API] DeleteMod() :: Sending request to => '{reqUrl}' with  headers => '{self.headers}'.")
         
-        resp = delete(reqUrl,
-            headers = self.headers
+        resp = self.session.delete(reqUrl,
+            headers = self.headers,
+            timeout = self.timeout()
         )
         
         return resp
\ No newline at end of file
@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from debugger import debugMsg
+from utils import Batch
+
+from .mod import ModApi
+
+import database
+
+def parseLookup(srcQuery: str, resp) -> tuple[str, int, bool]:
+    if resp is None or resp.status_code != 200:
+        return None
+    
+    try:
+        data = resp.json().get("data")
+    except Exception:
+        return None
+    
+    if not data or "id" not in data[0]:
+        return None
+    
+    return srcQuery, int(data[0]["id"]), bool(data[0].get("autoUpdate", False))
+
+def lookupMod(cfg: dict[str, any], api: ModApi, srcUrl: str, srcQuery: str) -> tuple[str, int, bool]:
+    try:
+        return parseLookup(srcQuery, api.GetMod(None, srcUrl, srcQuery))
+    except Exception as e:
+        debugMsg(cfg, 1, f"[Reconcile] Failed to look up query '{srcQuery}' from source '{srcUrl}'.")
+        debugMsg(cfg, 1, e)
+        
+        return None
+
+def ReconcileModCache(cfg: dict[str, any], api: ModApi = None) -> int:
+    # Prefills the mod cache for every query known to Best Mods without a fresh entry. Returns the amount cached.
+    apiInfo = cfg["api"]
+    
+    if api is None:
+        api = ModApi(cfg)
+        
+    cached = 0
+    
+    with ThreadPoolExecutor(max_workers = max(1, int(apiInfo["inFlight"]))) as executor:
+        for srcUrl in database.GetCacheSources():
+            queries = database.GetUncachedQueries(srcUrl, apiInfo["cacheTtl"])
+            
+            debugMsg(cfg, 2, f"[Reconcile] Found {len(queries)} uncached queries for source '{srcUrl}'.")
+            
+            for batch in Batch(queries, api.batchSize):
+                if apiInfo["batch"] and api.batchSupported is not False:
+                    resps = api.GetMods([(srcUrl, query) for query in batch])
+                    
+                    mods = [parseLookup(query, resp) for query, resp in zip(batch, resps)]
+                else:
+                    mods = list(executor.map(lambda query: lookupMod(cfg, api, srcUrl, query), batch))
+                    
+                mods = [mod for mod in mods if mod is not None]
+                
+                database.CacheMods(srcUrl, mods)
+                
+                cached += len(mods)
+                
+    return cached
\ No newline at end of file
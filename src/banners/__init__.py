@@ -0,0 +1,4 @@
+__title__ = "Banners"
+__version__ = "1.0.0"
+
+from .store import BannerStore
\ No newline at end of file
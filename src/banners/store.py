@@ -0,0 +1,130 @@
+import base64
+import hashlib
+import io
+import os
+
+from debugger import debugMsg
+
+import database
+
+# Pillow is only needed for banner variants.
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+class BannerStore():
+    cfg: dict[str, any] = None
+    
+    path: str = "banners"
+    variants: list[dict[str, any]] = []
+    submitVariant: str = None
+    
+    def __init__(self, cfg: dict[str, any]):
+        self.cfg = cfg
+        
+        info = self.cfg["banners"]
+        
+        self.path = info["path"]
+        self.variants = list(info["variants"])
+        self.submitVariant = info["submitVariant"]
+        
+        if len(self.variants) > 0 and Image is None:
+            debugMsg(self.cfg, 1, "[Banners] Pillow isn't installed. Banner variants won't be created.")
+            
+    @staticmethod
+    def Hash(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+    
+    def filePath(self, hash: str, variant: str = None) -> str:
+        # Spread files over two directory levels so no single directory grows too large.
+        name = hash if variant is None else f"{hash}.{variant}"
+        
+        return os.path.join(self.path, hash[:2], hash[2:4], name)
+    
+    def writeFile(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        
+        # Write to a temporary file first so readers never see a partial banner.
+        tmp = f"{path}.{os.getpid()}.tmp"
+        
+        with open(tmp, "wb") as f:
+            f.write(data)
+            
+        os.replace(tmp, path)
+        
+    def Put(self, data: bytes) -> str:
+        # Stores a banner and takes a reference to it. Identical banners are only stored once.
+        hash = self.Hash(data)
+        
+        def store():
+            path = self.filePath(hash)
+            
+            # Always check under the row lock. A concurrent Release() may have just removed the file.
+            if not os.path.exists(path):
+                self.writeFile(path, data)
+                
+                self.makeVariants(hash, data)
+                
+        database.RefBanner(hash, len(data), store)
+        
+        return hash
+    
+    def makeVariants(self, hash: str, data: bytes):
+        if Image is None:
+            return
+        
+        for variant in self.variants:
+            try:
+                img = Image.open(io.BytesIO(data))
+                
+                fmt = variant.get("format", img.format or "PNG").upper()
+                
+                if fmt == "JPEG" and img.mode not in ["RGB", "L"]:
+                    img = img.convert("RGB")
+                    
+                # Only ever shrink, keeping the aspect ratio.
+                img.thumbnail((variant.get("width", img.width), variant.get("height", img.height)))
+                
+                out = io.BytesIO()
+                
+                img.save(out, fmt, quality = variant.get("quality", 85), optimize = True)
+                
+                self.writeFile(self.filePath(hash, variant["name"]), out.getvalue())
+            except Exception as e:
+                debugMsg(self.cfg, 1, f"[Banners] Failed to create variant '{variant.get('name')}' of banner '{hash}'.")
+                debugMsg(self.cfg, 1, e)
+                
+    def Release(self, hash: str):
+        # Drops a reference to a banner. The banner and its variants are deleted once nothing references them.
+        def remove():
+            paths = [self.filePath(hash)] + [self.filePath(hash, variant["name"]) for variant in self.variants]
+            
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                    
+        # Files are removed while the banner row is locked so a concurrent Put() waits and writes them again.
+        database.UnrefBanner(hash, remove)
+            
+    def Get(self, hash: str, variant: str = None) -> bytes:
+        # Falls back to the original if the variant doesn't exist.
+        for path in [self.filePath(hash, variant), self.filePath(hash)] if variant is not None else [self.filePath(hash)]:
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                continue
+            
+        return None
+    
+    def Encode(self, hash: str) -> str:
+        # Base64 contents of the banner to submit to the API.
+        data = self.Get(hash, self.submitVariant)
+        
+        if data is None:
+            return None
+        
+        return base64.b64encode(data).decode("utf-8")
\ No newline at end of file
@@ -33,6 +33,36 @@ def setDefaultValues():
     if "sizeLimit" not in cfg["database"]:
         cfg["database"]["sizeLimit"] = 25000
         
+    if "claimLease" not in cfg["database"]:
+        cfg["database"]["claimLease"] = 900
+        
+    if "maxConnections" not in cfg["database"]:
+        cfg["database"]["maxConnections"] = 20
+        
+    if "staleTimeout" not in cfg["database"]:
+        cfg["database"]["staleTimeout"] = 300
+        
+    if "poolTimeout" not in cfg["database"]:
+        cfg["database"]["poolTimeout"] = 10
+        
+    if "retries" not in cfg["database"]:
+        cfg["database"]["retries"] = 3
+        
+    if "retryBackoff" not in cfg["database"]:
+        cfg["database"]["retryBackoff"] = 0.5
+        
+    if "banners" not in cfg:
+        cfg["banners"] = {}
+        
+    if "path" not in cfg["banners"]:
+        cfg["banners"]["path"] = "banners"
+        
+    if "variants" not in cfg["banners"]:
+        cfg["banners"]["variants"] = []
+        
+    if "submitVariant" not in cfg["banners"]:
+        cfg["banners"]["submitVariant"] = None
+        
     if "userAgents" not in cfg:
         cfg["userAgents"] = [
             "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0"
@@ -61,6 +91,51 @@ def setDefaultValues():
         
     if "intervalMax" not in cfg["api"]:
         cfg["api"]["intervalMax"] = 60
+        
+    if "inFlight" not in cfg["api"]:
+        cfg["api"]["inFlight"] = 4
+        
+    if "batch" not in cfg["api"]:
+        cfg["api"]["batch"] = True
+        
+    if "batchSize" not in cfg["api"]:
+        cfg["api"]["batchSize"] = 50
+        
+    if "cacheTtl" not in cfg["api"]:
+        cfg["api"]["cacheTtl"] = 86400
+        
+    if "poolSize" not in cfg["api"]:
+        cfg["api"]["poolSize"] = 10
+        
+    if "connectTimeout" not in cfg["api"]:
+        cfg["api"]["connectTimeout"] = 5
+        
+    if "readTimeout" not in cfg["api"]:
+        cfg["api"]["readTimeout"] = 30
+        
+    if "retries" not in cfg["api"]:
+        cfg["api"]["retries"] = 3
+        
+    if "retryBackoff" not in cfg["api"]:
+        cfg["api"]["retryBackoff"] = 0.5
+        
+    if "supervisor" not in cfg:
+        cfg["supervisor"] = {}
+        
+    if "restartBackoff" not in cfg["supervisor"]:
+        cfg["supervisor"]["restartBackoff"] = 5
+        
+    if "restartBackoffMax" not in cfg["supervisor"]:
+        cfg["supervisor"]["restartBackoffMax"] = 300
+        
+    if "stableTime" not in cfg["supervisor"]:
+        cfg["supervisor"]["stableTime"] = 600
+        
+    if "stopTimeout" not in cfg["supervisor"]:
+        cfg["supervisor"]["stopTimeout"] = 60
+        
+    if "statusInterval" not in cfg["supervisor"]:
+        cfg["supervisor"]["statusInterval"] = 300
 
 def loadCfg(path: str):
     global cfg
@@ -89,10 +164,36 @@ def printCfg():
     print(f"\t\tPass => {cfg['database']['pass']}")
     print(f"\t\tPort => {cfg['database']['port']}")
     print(f"\t\tSize Limit => {cfg['database']['sizeLimit']} MBs")
+    print(f"\t\tClaim Lease => {cfg['database']['claimLease']} seconds")
+    print(f"\t\tMax Connections => {cfg['database']['maxConnections']}")
+    print(f"\t\tStale Timeout => {cfg['database']['staleTimeout']} seconds")
+    print(f"\t\tPool Timeout => {cfg['database']['poolTimeout']} seconds")
+    print(f"\t\tRetries => {cfg['database']['retries']}")
+    print(f"\t\tRetry Backoff => {cfg['database']['retryBackoff']} seconds")
+    print("\tBanners")
+    print(f"\t\tPath => {cfg['banners']['path']}")
+    for variant in cfg["banners"]["variants"]:
+        print(f"\t\t- Variant => {variant}")
+    print(f"\t\tSubmit Variant => {cfg['banners']['submitVariant']}")
     print("\tAPI")
     print(f"\t\tHost => {cfg['api']['host']}")
     print(f"\t\tToken => {cfg['api']['token']}")
     print(f"\t\tLimit => {cfg['api']['limit']}")
+    print(f"\t\tIn Flight => {cfg['api']['inFlight']}")
+    print(f"\t\tBatch => {cfg['api']['batch']}")
+    print(f"\t\tBatch Size => {cfg['api']['batchSize']}")
+    print(f"\t\tCache TTL => {cfg['api']['cacheTtl']} seconds")
+    print(f"\t\tPool Size => {cfg['api']['poolSize']}")
+    print(f"\t\tConnect Timeout => {cfg['api']['connectTimeout']} seconds")
+    print(f"\t\tRead Timeout => {cfg['api']['readTimeout']} seconds")
+    print(f"\t\tRetries => {cfg['api']['retries']}")
+    print(f"\t\tRetry Backoff => {cfg['api']['retryBackoff']} seconds")
+    print("\tSupervisor")
+    print(f"\t\tRestart Backoff => {cfg['supervisor']['restartBackoff']} seconds")
+    print(f"\t\tRestart Backoff Max => {cfg['supervisor']['restartBackoffMax']} seconds")
+    print(f"\t\tStable Time => {cfg['supervisor']['stableTime']} seconds")
+    print(f"\t\tStop Timeout => {cfg['supervisor']['stopTimeout']} seconds")
+    print(f"\t\tStatus Interval => {cfg['supervisor']['statusInterval']} seconds")
     print("\tParsers")
     idx = 0
     for par in cfg["parsers"]:
@@ -173,6 +274,96 @@ def printCfg():
                     for k2, v2 in par["catsChildren"][k].items():
                         print(f"\t\t\t\t\t{k2} => {v2}")
                         
+        if "driverPoolSize" in par:
+            print(f"\t\t\tDriver Pool Size => {par['driverPoolSize']}")
+        
+        if "httpFirst" in par:
+            print(f"\t\t\tHTTP First => {par['httpFirst']}")
+        
+        if "httpTimeout" in par:
+            print(f"\t\t\tHTTP Timeout => {par['httpTimeout']}")
+        
+        if "findBatchSize" in par:
+            print(f"\t\t\tFind Batch Size => {par['findBatchSize']}")
+        
+        if "requestRate" in par:
+            print(f"\t\t\tRequest Rate => {par['requestRate']}")
+        
+        if "requestBurst" in par:
+            print(f"\t\t\tRequest Burst => {par['requestBurst']}")
+        
+        if "requestConcurrency" in par:
+            print(f"\t\t\tRequest Concurrency => {par['requestConcurrency']}")
+        
+        if "requestJitter" in par:
+            print(f"\t\t\tRequest Jitter => {par['requestJitter']}")
+        
+        if "adaptive" in par:
+            print(f"\t\t\tAdaptive => {par['adaptive']}")
+        
+        if "busyIntervalMin" in par:
+            print(f"\t\t\tBusy Interval Min => {par['busyIntervalMin']}")
+        
+        if "idleIntervalMax" in par:
+            print(f"\t\t\tIdle Interval Max => {par['idleIntervalMax']}")
+        
+        if "parseLimitMax" in par:
+            print(f"\t\t\tParse Limit Max => {par['parseLimitMax']}")
+        
+        if "addLimitMax" in par:
+            print(f"\t\t\tAdd Limit Max => {par['addLimitMax']}")
+        
+        if "reparseAfter" in par:
+            print(f"\t\t\tReparse After => {par['reparseAfter']}")
+        
+        if "listen" in par:
+            print(f"\t\t\tListen => {par['listen']}")
+        
+        if "notifyDelay" in par:
+            print(f"\t\t\tNotify Delay => {par['notifyDelay']}")
+        
+        if "driverRecyclePages" in par:
+            print(f"\t\t\tDriver Recycle Pages => {par['driverRecyclePages']}")
+        
+        if "driverRecycleRss" in par:
+            print(f"\t\t\tDriver Recycle RSS => {par['driverRecycleRss']}")
+        
+        if "driverWarmSpare" in par:
+            print(f"\t\t\tDriver Warm Spare => {par['driverWarmSpare']}")
+        
+        if "pageLoadTimeout" in par:
+            print(f"\t\t\tPage Load Timeout => {par['pageLoadTimeout']}")
+        
+        if "scriptTimeout" in par:
+            print(f"\t\t\tScript Timeout => {par['scriptTimeout']}")
+        
+        if "modTimeout" in par:
+            print(f"\t\t\tMod Timeout => {par['modTimeout']}")
+        
+        if "timeoutRetryDelay" in par:
+            print(f"\t\t\tTimeout Retry Delay => {par['timeoutRetryDelay']}")
+        
+        if "blockResources" in par:
+            print(f"\t\t\tBlock Resources => {par['blockResources']}")
+        
+        if "blockHosts" in par:
+            print(f"\t\t\tBlock Hosts => {par['blockHosts']}")
+        
+        if "allowHosts" in par:
+            print(f"\t\t\tAllow Hosts => {par['allowHosts']}")
+        
+        if "pageLoadStrategy" in par:
+            print(f"\t\t\tPage Load Strategy => {par['pageLoadStrategy']}")
+        
+        if "profilePath" in par:
+            print(f"\t\t\tProfile Path => {par['profilePath']}")
+        
+        if "profileCacheSize" in par:
+            print(f"\t\t\tProfile Cache Size => {par['profileCacheSize']}")
+        
+        if "persistCookies" in par:
+            print(f"\t\t\tPersist Cookies => {par['persistCookies']}")
+        
         if "avoidIds" in par:
             print("\t\t\tAvoid IDs")
             for id in par["avoidIds"]:
@@ -1,6 +1,10 @@
 __title__ = "Database"
 __version__ = "1.0.0"
 
-from .connection import init, setup, close, getTableSize
+from .connection import init, close, closeAll, context, getTableSize, ClaimState
+from .migrations import setup, getSchemaVersion
 from .query.source import AddSource, GetSource, GetSources, UpdateSource, DeleteSource
-from .query.query import AddQuery, GetQuery, GetQueries, UpdateQuery, UpdateQueryQuery, DeleteQuery
\ No newline at end of file
+from .query.query import AddQuery, AddQueriesBulk, ExpireQueries, GetQuery, GetQueries, CountQueries, ClaimQueries, FailQuery, TimeoutQuery, ReleaseQueries, GetQueryPayload, GetQueryPayloads, SavePayload, SaveQuery, UpdateQuery, UpdateQueryQuery, DeleteQuery
+from .query.cache import GetCachedMods, GetCachedMod, CacheMods, CacheMod, UncacheMod, GetCacheSources, GetUncachedQueries
+from .notify import ADD_CHANNEL, PARSE_CHANNEL, Notify, Listener
+from .query.banner import RefBanner, UnrefBanner
\ No newline at end of file
@@ -1,11 +1,64 @@
 from peewee import *
 
 from playhouse.migrate import *
+from playhouse.pool import PooledPostgresqlExtDatabase
+from playhouse.postgres_ext import BinaryJSONField
 
-db = PostgresqlDatabase(None)
+import re
+import time
+
+from enum import IntEnum
+
+# Statements that are safe to send again if we can't tell whether the server ran them. A repeated notification only wakes listeners twice.
+READ_ONLY = re.compile(r"^\s*(SELECT|SHOW)\b", re.IGNORECASE)
+
+class RetryDatabase(PooledPostgresqlExtDatabase):
+    retries: int = 3
+    retryBackoff: float = 0.5
+    
+    def execute_sql(self, sql, params=None, commit=None):
+        attempt = 0
+        
+        while True:
+            sent = False
+            
+            try:
+                # Checking out a connection fails before anything reaches the server.
+                self.cursor()
+                
+                sent = True
+                
+                return super().execute_sql(sql, params, commit)
+            except (OperationalError, InterfaceError):
+                # A statement inside a transaction can't be replayed on its own. Writes that may have reached the server could be applied twice.
+                if self.in_transaction() or attempt >= self.retries or (sent and not READ_ONLY.match(sql)):
+                    raise
+                
+                # Throw away the broken connection so the next attempt checks out a fresh one.
+                try:
+                    self.manual_close()
+                except Exception:
+                    pass
+                    
+                time.sleep(self.retryBackoff * (2 ** attempt))
+                
+                attempt += 1
+                
+    def forget(self):
+        # Drops pooled connections inherited from a parent process without closing them. Closing would end the parent's session over the shared socket.
+        with self._lock:
+            self._connections = []
+            self._in_use = {}
+            
+        self._state.reset()
+
+db = RetryDatabase(None)
 migrator = None
 
-import re
+class ClaimState(IntEnum):
+    FREE = 0
+    PARSE = 1
+    ADD = 2
 
 class BaseModel(Model):
     class Meta:
@@ -29,68 +82,116 @@ class Query(BaseModel):
     
     categoryId = IntegerField(null=True)
     
-    banner = TextField(null=True)
-    
     name = CharField(null=True, max_length=120)
     ownerName = CharField(null=True, max_length=64)
     
-    description = TextField(null=True)
     descriptionShort = CharField(null=True, max_length=256)
-    install = TextField(null=True)
     
     nsfw = BooleanField(null=True)
     autoUpdate = BooleanField(null=True)
     
-    downloads = TextField(null=True)
-    screenshots = TextField(null=True)
-    installers = TextField(null=True)
+    claimState = IntegerField(default=ClaimState.FREE)
+    claimedUntil = DateTimeField(null=True)
+    
+    # Parse attempts that failed or timed out in a row and when the query may be parsed again.
+    timeouts = IntegerField(default=0)
+    retryAfter = DateTimeField(null=True)
     
     class Meta:
         primary_key = CompositeKey("url", "query")
         indexes = (
             (("url", "modId"), True)
         )
+        
+# Large mod contents kept out of the query table so queue scans only read narrow rows.
+class QueryPayload(BaseModel):
+    url = CharField()
+    query = CharField()
+    
+    banner = TextField(null=True)
+    
+    description = TextField(null=True)
+    install = TextField(null=True)
+    
+    downloads = BinaryJSONField(null=True)
+    screenshots = BinaryJSONField(null=True)
+    installers = BinaryJSONField(null=True)
+    
+    # Hash of the banner in the banner store. The banner column only holds legacy base64 banners.
+    bannerHash = CharField(null=True, max_length=64)
     
-def init(host: str, name: str, user: str, password: str, port: int):
+    # Where the banner was downloaded from and its HTTP validators.
+    bannerUrl = TextField(null=True)
+    bannerEtag = CharField(null=True)
+    bannerModified = CharField(null=True, max_length=64)
+    
+    # Fingerprint of each parsed field and the fields changed since the mod was last submitted.
+    fingerprints = BinaryJSONField(null=True)
+    changedFields = BinaryJSONField(null=True)
+    
+    class Meta:
+        table_name = "query_payload"
+        primary_key = CompositeKey("url", "query")
+        constraints = [
+            SQL("FOREIGN KEY (url, query) REFERENCES query (url_id, query) ON DELETE CASCADE ON UPDATE CASCADE")
+        ]
+        
+# Best Mods IDs and auto update flags looked up through the API, keyed by source.
+class ModCache(BaseModel):
+    srcUrl = CharField()
+    srcQuery = CharField()
+    
+    modId = IntegerField()
+    autoUpdate = BooleanField(null=True)
+    
+    fetched = DateTimeField()
+    
+    class Meta:
+        table_name = "mod_cache"
+        primary_key = CompositeKey("srcUrl", "srcQuery")
+        
+# Reference counts for banners in the on-disk banner store.
+class Banner(BaseModel):
+    hash = CharField(primary_key=True, max_length=64)
+    size = IntegerField()
+    refs = IntegerField(default=0)
+    created = DateTimeField()
+    
+class SchemaVersion(BaseModel):
+    version = IntegerField(primary_key=True)
+    name = CharField()
+    applied = DateTimeField()
+    
+    class Meta:
+        table_name = "schema_version"
+    
+def init(host: str, name: str, user: str, password: str, port: int, maxConnections: int = 20, staleTimeout: int = 300, poolTimeout: int = 10, retries: int = 3, retryBackoff: float = 0.5):
     try:
         global db
         db.init(name,
             host=host,
             user=user,
             password=password,
-            port=port)
+            port=port,
+            max_connections=maxConnections,
+            stale_timeout=staleTimeout,
+            timeout=poolTimeout)
+        
+        db.retries = retries
+        db.retryBackoff = retryBackoff
         
         global migrator
         migrator = PostgresqlMigrator(db)
         
+        # Never reuse a connection a forked process inherited.
+        db.forget()
+        
         db.connect()
     except Exception as e:
         return e
 
-def setup():
-    try:            
-        db.create_tables([Source, Query], safe=True)
-    except Exception as e:
-        if not "'u'" in str(e):
-            print("Failed to create tables!")
-            print(str(e))
-        
-    if migrator:
-        # Add "nsfw" and "autoUpdate" fields (1-14-24).
-        try:
-            migrate(
-                migrator.add_column("query", "nsfw", Query.nsfw),
-                migrator.add_column("query", "autoUpdate", Query.autoUpdate)
-            )
-        except Exception as e:
-            if not "already exists" in str(e):
-                print("[M1] Failed to migrate database!")
-                print(e)
-                
 def getTableSize(table: str) -> int:
-    cursor = db.cursor()
-    
-    cursor.execute(f"SELECT pg_table_size('public.{table}') / 1024 /1024 || 'MB';")
+    cursor = db.execute_sql(f"SELECT pg_table_size('public.{table}') / 1024 /1024 || 'MB';")
 
     res = cursor.fetchone()
     
@@ -118,8 +219,19 @@ def getTableSize(table: str) -> int:
     
     return size
 
+def context():
+    # Checks a connection out of the pool for the calling thread and returns it when done.
+    return db.connection_context()
+
 def close():
     try:
         db.close()
+    except Exception as e:
+        return e
+        
+def closeAll():
+    # Closes every pooled connection, not just returns the current one to the pool. Call before forking.
+    try:
+        db.close_all()
     except Exception as e:
         return e
\ No newline at end of file
@@ -0,0 +1,148 @@
+from datetime import datetime
+
+from peewee import fn, BooleanField, IntegerField, DateTimeField, CharField, TextField
+from playhouse.migrate import migrate
+from playhouse.postgres_ext import BinaryJSONField
+
+from . import connection
+from .connection import db, SchemaVersion
+
+# Arbitrary key for the advisory lock that serializes migration runs.
+LOCK_ID = 73217
+
+# Partial indexes matching the hot GetQueries()/ClaimQueries() predicates. {table} is filled in so benchmarks can reuse them.
+HOT_INDEXES = {
+    "query_parse_claim": 'CREATE INDEX IF NOT EXISTS {name} ON {table} (url_id, "lastParsed" ASC NULLS FIRST) WHERE allow AND "claimState" = 0',
+    "query_parse_new": 'CREATE INDEX IF NOT EXISTS {name} ON {table} (url_id, "lastParsed" ASC NULLS FIRST) WHERE allow AND "claimState" = 0 AND ("modId" IS NULL OR "modId" = 0)',
+    "query_parse_existing": 'CREATE INDEX IF NOT EXISTS {name} ON {table} (url_id, "lastParsed" ASC NULLS FIRST) INCLUDE ("categoryId") WHERE allow AND "claimState" = 0 AND "modId" IS NOT NULL AND "modId" <> 0',
+    "query_add_ready": 'CREATE INDEX IF NOT EXISTS {name} ON {table} (url_id, "lastParsed" ASC NULLS FIRST) WHERE "needsUpdating" AND allow AND "claimState" = 0 AND name IS NOT NULL AND name <> \'\' AND "viewUrl" IS NOT NULL AND "viewUrl" <> \'\'',
+    "query_claimed": 'CREATE INDEX IF NOT EXISTS {name} ON {table} ("claimedUntil") WHERE "claimState" <> 0'
+}
+
+def createIndexes(names: list[str], table: str = "query"):
+    for name in names:
+        db.execute_sql(HOT_INDEXES[name].format(name = name, table = table))
+
+def addColumns(table: str, fields: dict):
+    # Only add columns that don't exist yet so databases set up by the old ad hoc migrations upgrade cleanly.
+    existing = [col.name for col in db.get_columns(table)]
+    
+    ops = [connection.migrator.add_column(table, name, field) for name, field in fields.items() if name not in existing]
+    
+    if len(ops) > 0:
+        migrate(*ops)
+
+def m1BaseTables():
+    # Schema as of the first release. Frozen so later model changes don't alter history.
+    db.execute_sql('CREATE TABLE IF NOT EXISTS "source" ("url" VARCHAR(255) NOT NULL PRIMARY KEY, "name" VARCHAR(255) NOT NULL)')
+    db.execute_sql('CREATE TABLE IF NOT EXISTS "query" ("url_id" VARCHAR(255) NOT NULL, "query" VARCHAR(255) NOT NULL, "modId" INTEGER, "lastParsed" TIMESTAMP, "allow" BOOLEAN NOT NULL, "needsUpdating" BOOLEAN NOT NULL, "viewUrl" VARCHAR(256), "categoryId" INTEGER, "banner" TEXT, "name" VARCHAR(120), "ownerName" VARCHAR(64), "description" TEXT, "descriptionShort" VARCHAR(256), "install" TEXT, "downloads" TEXT, "screenshots" TEXT, "installers" TEXT, PRIMARY KEY ("url_id", "query"), FOREIGN KEY ("url_id") REFERENCES "source" ("url"))')
+
+def m2NsfwAutoUpdate():
+    # Add "nsfw" and "autoUpdate" fields (1-14-24).
+    addColumns("query", {
+        "nsfw": BooleanField(null=True),
+        "autoUpdate": BooleanField(null=True)
+    })
+
+def m3ClaimQueue():
+    addColumns("query", {
+        "claimState": IntegerField(default=0),
+        "claimedUntil": DateTimeField(null=True)
+    })
+    
+    createIndexes(["query_parse_claim", "query_claimed"])
+
+def m4HotIndexes():
+    createIndexes(["query_parse_new", "query_parse_existing", "query_add_ready"])
+
+def m5QueryPayload():
+    db.execute_sql('CREATE TABLE IF NOT EXISTS "query_payload" ("url" VARCHAR(255) NOT NULL, "query" VARCHAR(255) NOT NULL, "banner" TEXT, "description" TEXT, "install" TEXT, "downloads" JSONB, "screenshots" JSONB, "installers" JSONB, PRIMARY KEY ("url", "query"), FOREIGN KEY (url, query) REFERENCES query (url_id, query) ON DELETE CASCADE ON UPDATE CASCADE)')
+    
+    # Move mod contents over. Relations were stored as JSON strings in text columns.
+    db.execute_sql("""INSERT INTO "query_payload" ("url", "query", "banner", "description", "install", "downloads", "screenshots", "installers")
+        SELECT url_id, query, banner, description, install, NULLIF(downloads, '')::jsonb, NULLIF(screenshots, '')::jsonb, NULLIF(installers, '')::jsonb
+        FROM query
+        WHERE banner IS NOT NULL OR description IS NOT NULL OR install IS NOT NULL OR downloads IS NOT NULL OR screenshots IS NOT NULL OR installers IS NOT NULL
+        ON CONFLICT DO NOTHING""")
+    
+    # The add index referenced the description column.
+    db.execute_sql("DROP INDEX IF EXISTS query_add_ready")
+    
+    for col in ["banner", "description", "install", "downloads", "screenshots", "installers"]:
+        db.execute_sql(f'ALTER TABLE query DROP COLUMN IF EXISTS "{col}"')
+        
+    createIndexes(["query_add_ready"])
+
+def m6ModCache():
+    db.execute_sql('CREATE TABLE IF NOT EXISTS "mod_cache" ("srcUrl" VARCHAR(255) NOT NULL, "srcQuery" VARCHAR(255) NOT NULL, "modId" INTEGER NOT NULL, "autoUpdate" BOOLEAN, "fetched" TIMESTAMP NOT NULL, PRIMARY KEY ("srcUrl", "srcQuery"))')
+
+def m7FieldFingerprints():
+    addColumns("query_payload", {
+        "fingerprints": BinaryJSONField(null=True),
+        "changedFields": BinaryJSONField(null=True)
+    })
+
+def m8BannerStore():
+    db.execute_sql('CREATE TABLE IF NOT EXISTS "banner" ("hash" VARCHAR(64) NOT NULL PRIMARY KEY, "size" INTEGER NOT NULL, "refs" INTEGER NOT NULL, "created" TIMESTAMP NOT NULL)')
+    
+    addColumns("query_payload", {
+        "bannerHash": CharField(null=True, max_length=64)
+    })
+
+def m9BannerSource():
+    addColumns("query_payload", {
+        "bannerUrl": TextField(null=True),
+        "bannerEtag": CharField(null=True),
+        "bannerModified": CharField(null=True, max_length=64)
+    })
+
+def m10ParseTimeouts():
+    addColumns("query", {
+        "timeouts": IntegerField(default=0),
+        "retryAfter": DateTimeField(null=True)
+    })
+
+# Versions must only ever be appended to.
+MIGRATIONS = [
+    (1, "base tables", m1BaseTables),
+    (2, "nsfw and auto update", m2NsfwAutoUpdate),
+    (3, "claim queue", m3ClaimQueue),
+    (4, "hot query indexes", m4HotIndexes),
+    (5, "query payload table", m5QueryPayload),
+    (6, "mod cache table", m6ModCache),
+    (7, "field fingerprints", m7FieldFingerprints),
+    (8, "banner store", m8BannerStore),
+    (9, "banner source", m9BannerSource),
+    (10, "parse timeouts", m10ParseTimeouts)
+]
+
+def getSchemaVersion() -> int:
+    version = SchemaVersion.select(fn.MAX(SchemaVersion.version)).scalar()
+    
+    return version or 0
+
+def setup() -> int:
+    # Apply pending schema migrations in order. Returns the amount applied.
+    db.create_tables([SchemaVersion], safe=True)
+    
+    applied = 0
+    
+    with db.atomic():
+        # Only one process may migrate at a time. Others wait here and then find nothing left to do.
+        db.execute_sql("SELECT pg_advisory_xact_lock(%s)", (LOCK_ID,))
+        
+        current = getSchemaVersion()
+        
+        for version, name, func in MIGRATIONS:
+            if version <= current:
+                continue
+                
+            print(f"[M{version}] Migrating database ({name}).")
+            
+            func()
+            
+            SchemaVersion.create(version = version, name = name, applied = datetime.now())
+            
+            applied += 1
+            
+    return applied
\ No newline at end of file
@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from .connection import db
+
+# Channels stages hand work over on. Payloads are the source URL.
+ADD_CHANNEL = "scanrus_add"
+PARSE_CHANNEL = "scanrus_parse"
+
+def Notify(channel: str, url: str):
+    # Delivered to listeners once the surrounding transaction (if any) commits.
+    db.execute_sql("SELECT pg_notify(%s, %s)", (channel, url))
+
+class Listener():
+    # LISTENs on a dedicated connection outside the pool and wakes waiters when their source is notified.
+    url: str = None
+    channels: list[str] = []
+    
+    # How long to wait before reconnecting after the connection was lost.
+    reconnectDelay: int = 60
+    
+    def __init__(self, url: str, channels: list[str]):
+        self.url = url
+        self.channels = channels
+        
+        self.conn = None
+        self.loop = None
+        self.retryAt = 0.0
+        
+        self.events: dict[str, asyncio.Event] = { channel: asyncio.Event() for channel in channels }
+        
+    def Start(self):
+        # Must be called from the event loop the waiters run on.
+        self.loop = asyncio.get_running_loop()
+        
+        try:
+            self.conn = psycopg2.connect(database = db.database, **db.connect_params)
+            self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            
+            with self.conn.cursor() as cur:
+                for channel in self.channels:
+                    cur.execute(f'LISTEN "{channel}"')
+                    
+            self.loop.add_reader(self.conn, self.read)
+        except Exception:
+            self.Stop()
+            
+            raise
+            
+    def Stop(self):
+        self.retryAt = time.monotonic() + self.reconnectDelay
+        
+        if self.conn is None:
+            return
+            
+        try:
+            self.loop.remove_reader(self.conn)
+        except Exception:
+            pass
+            
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+            
+        self.conn = None
+        
+    def read(self):
+        try:
+            self.conn.poll()
+        except Exception:
+            # Waiters fall back to polling until we reconnect.
+            self.Stop()
+            
+            return
+            
+        while self.conn.notifies:
+            notify = self.conn.notifies.pop(0)
+            
+            if notify.payload == self.url and notify.channel in self.events:
+                self.events[notify.channel].set()
+                
+    async def Wait(self, channel: str, timeout: float) -> bool:
+        # Waits up to timeout seconds for a notification. Returns whether one arrived.
+        if self.conn is None and time.monotonic() >= self.retryAt:
+            try:
+                self.Start()
+            except Exception:
+                pass
+                
+        event = self.events[channel]
+        
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+            
+        event.clear()
+        
+        return True
\ No newline at end of file
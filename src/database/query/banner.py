@@ -0,0 +1,33 @@
+from ..connection import db, Banner
+
+from datetime import datetime
+from typing import Callable
+
+def RefBanner(hash: str, size: int, onRef: Callable = None):
+    # onRef runs while the banner row is locked so a concurrent UnrefBanner() can't remove the banner underneath it.
+    with db.atomic():
+        Banner.insert(hash = hash, size = size, refs = 1, created = datetime.now()).on_conflict(
+            conflict_target = [Banner.hash],
+            update = { Banner.refs: Banner.refs + 1 }
+        ).execute()
+        
+        if onRef is not None:
+            onRef()
+    
+def UnrefBanner(hash: str, onOrphan: Callable = None) -> int:
+    # Returns the references left. Banners without references are removed and onOrphan runs before the row lock is released.
+    with db.atomic():
+        res = list(Banner.update(refs = Banner.refs - 1).where(Banner.hash == hash).returning(Banner.refs).tuples().execute())
+        
+        if len(res) < 1:
+            return 0
+        
+        refs = res[0][0]
+        
+        if refs < 1:
+            Banner.delete().where((Banner.hash == hash) & (Banner.refs < 1)).execute()
+            
+            if onOrphan is not None:
+                onOrphan()
+            
+        return refs
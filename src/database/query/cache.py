@@ -0,0 +1,62 @@
+from ..connection import ModCache, Query
+
+from datetime import datetime, timedelta
+
+def GetCachedMods(srcUrl: str, srcQueries: list[str], ttl: int) -> dict[str, ModCache]:
+    # Returns entries fetched within the last ttl seconds, keyed by source query.
+    if ttl <= 0 or len(srcQueries) < 1:
+        return {}
+    
+    oldest = datetime.now() - timedelta(seconds = ttl)
+    
+    rows = ModCache.select().where(
+        (ModCache.srcUrl == srcUrl) &
+        (ModCache.srcQuery << srcQueries) &
+        (ModCache.fetched >= oldest)
+    )
+    
+    return { row.srcQuery: row for row in rows }
+
+def GetCachedMod(srcUrl: str, srcQuery: str, ttl: int) -> ModCache:
+    return GetCachedMods(srcUrl, [srcQuery], ttl).get(srcQuery)
+
+def CacheMods(srcUrl: str, mods: list[tuple[str, int, bool]], chunkSize: int = 1000):
+    # Mods are (source query, mod ID, auto update) tuples.
+    now = datetime.now()
+    
+    rows = [{ "srcUrl": srcUrl, "srcQuery": srcQuery, "modId": modId, "autoUpdate": autoUpdate, "fetched": now } for srcQuery, modId, autoUpdate in mods]
+    
+    for i in range(0, len(rows), chunkSize):
+        (ModCache.insert_many(rows[i:i + chunkSize])
+            .on_conflict(
+                conflict_target = [ModCache.srcUrl, ModCache.srcQuery],
+                preserve = [ModCache.modId, ModCache.autoUpdate, ModCache.fetched]
+            )
+            .execute())
+        
+def CacheMod(srcUrl: str, srcQuery: str, modId: int, autoUpdate: bool):
+    CacheMods(srcUrl, [(srcQuery, modId, autoUpdate)])
+    
+def UncacheMod(srcUrl: str, srcQuery: str):
+    ModCache.delete().where((ModCache.srcUrl == srcUrl) & (ModCache.srcQuery == srcQuery)).execute()
+
+def GetCacheSources() -> list[str]:
+    # Sources that have queries already known to Best Mods.
+    rows = Query.select(Query.url).where((Query.modId.is_null(False)) & (Query.modId != 0)).distinct().tuples()
+    
+    return [row[0] for row in rows]
+
+def GetUncachedQueries(srcUrl: str, ttl: int) -> list[str]:
+    # Queries known to Best Mods without a fresh cache entry.
+    oldest = datetime.now() - timedelta(seconds = ttl)
+    
+    fresh = ModCache.select(ModCache.srcQuery).where((ModCache.srcUrl == srcUrl) & (ModCache.fetched >= oldest))
+    
+    rows = Query.select(Query.query).where(
+        (Query.url == srcUrl) &
+        (Query.modId.is_null(False)) &
+        (Query.modId != 0) &
+        (Query.query.not_in(fresh))
+    ).tuples()
+    
+    return [row[0] for row in rows]
\ No newline at end of file
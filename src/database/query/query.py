@@ -1,8 +1,8 @@
-from ..connection import Query
+from ..connection import db, Query, QueryPayload, ClaimState
 
 from datetime import datetime, timedelta
 
-from peewee import fn
+from peewee import fn, Tuple, SQL
 
 def AddQuery(url: str, query: str) -> Query:
     query = Query.create(url = url, query = query)
@@ -11,29 +11,60 @@ def AddQuery(url: str, query: str) -> Query:
     
     return query
 
+def AddQueriesBulk(url: str, queries: list[str], chunkSize: int = 1000) -> int:
+    # Insert queries in chunks, ignoring ones that already exist. Returns the amount of new queries.
+    queries = list(dict.fromkeys(queries))
+    
+    added = 0
+    
+    for i in range(0, len(queries), chunkSize):
+        rows = [{ "url": url, "query": query } for query in queries[i:i + chunkSize]]
+        
+        res = (Query.insert_many(rows)
+            .on_conflict(conflict_target = [Query.url, Query.query], action = "IGNORE")
+            .returning(Query.query)
+            .tuples()
+            .execute())
+        
+        added += len(list(res))
+        
+    return added
+
+def ExpireQueries(url: str, lastmods: dict[str, datetime]) -> int:
+    # Clear the last parsed time of queries modified at the source since we last parsed them so they're parsed first.
+    rows = Query.select(Query.query, Query.lastParsed).where(
+        (Query.url == url) &
+        (Query.query << list(lastmods.keys())) &
+        (Query.lastParsed.is_null(False))
+    )
+    
+    stale = [row.query for row in rows if row.lastParsed < lastmods[row.query]]
+    
+    if len(stale) < 1:
+        return 0
+    
+    return Query.update(lastParsed = None).where((Query.url == url) & (Query.query << stale)).execute()
+
 def GetQuery(url: str, query: str) -> Query:
     query = Query.get(Query.url == url, Query.query == query)
     
     return query
     
-def GetQueries(
-    limit: int = 10,
+def FilterQueries(
+    queries,
     url: str = None,
     query: str = None,
     needsUpdating: bool = None,
     preTime: timedelta = None,
     allow: bool = None,
-    random: bool = None,
-    orderByLastParsed: bool = True,
     nameNotNull: bool = None,
     descNotNull: bool = None,
     viewUrlNotNull: bool = None,
     lastParsedNull: bool = None,
     exists: bool = None,
-    cats: list[int] = None
-) -> list:
-    queries = Query.select()
-    
+    cats: list[int] = None,
+    retryReady: bool = None
+):
     if url is not None:
         queries = queries.where(Query.url == url)
         
@@ -47,7 +78,13 @@ def GetQueries(
         queries = queries.where((Query.name.is_null(False)) & (Query.name != ""))
         
     if descNotNull:
-        queries = queries.where((Query.description.is_null(False) ) & (Query.description != ""))
+        # Descriptions live in the payload table. This is a primary key lookup per candidate row.
+        queries = queries.where(fn.EXISTS(QueryPayload.select(SQL("1")).where(
+            (QueryPayload.url == Query.url) &
+            (QueryPayload.query == Query.query) &
+            (QueryPayload.description.is_null(False)) &
+            (QueryPayload.description != "")
+        )))
         
     if viewUrlNotNull:
         queries = queries.where((Query.viewUrl.is_null(False) & (Query.viewUrl != "")))
@@ -70,6 +107,42 @@ def GetQueries(
         
     if cats is not None:
         queries = queries.where(Query.categoryId << cats)
+        
+    # Skip queries still backing off after timing out.
+    if retryReady:
+        queries = queries.where((Query.retryAfter.is_null(True)) | (Query.retryAfter < datetime.now()))
+        
+    return queries
+    
+def GetQueries(
+    limit: int = 10,
+    url: str = None,
+    query: str = None,
+    needsUpdating: bool = None,
+    preTime: timedelta = None,
+    allow: bool = None,
+    random: bool = None,
+    orderByLastParsed: bool = True,
+    nameNotNull: bool = None,
+    descNotNull: bool = None,
+    viewUrlNotNull: bool = None,
+    lastParsedNull: bool = None,
+    exists: bool = None,
+    cats: list[int] = None
+) -> list:
+    queries = FilterQueries(Query.select(),
+        url = url,
+        query = query,
+        needsUpdating = needsUpdating,
+        preTime = preTime,
+        allow = allow,
+        nameNotNull = nameNotNull,
+        descNotNull = descNotNull,
+        viewUrlNotNull = viewUrlNotNull,
+        lastParsedNull = lastParsedNull,
+        exists = exists,
+        cats = cats
+    )
     
     orders = []
     
@@ -85,6 +158,101 @@ def GetQueries(
     
     return list(queries)
     
+def CountQueries(cap: int = None, **filters) -> int:
+    # Counts free queries matching the filters. Capped so large backlogs don't scan the whole table.
+    queries = FilterQueries(Query.select(Query.url), **filters).where(Query.claimState == ClaimState.FREE)
+    
+    if cap is not None:
+        queries = queries.limit(cap)
+        
+    return queries.count()
+    
+def claimableQueries(limit: int, **filters):
+    # The rows ClaimQueries() locks. Kept separate so benchmarks can explain the exact statement.
+    return (FilterQueries(Query.select(Query.url, Query.query), **filters)
+        .where(Query.claimState == ClaimState.FREE)
+        .order_by(Query.lastParsed.asc(nulls = "FIRST"), Query.query)
+        .limit(limit)
+        .for_update("FOR UPDATE SKIP LOCKED"))
+    
+def ClaimQueries(
+    state: ClaimState,
+    lease: timedelta,
+    limit: int = 10,
+    **filters
+) -> list:
+    # Claims up to limit free queries for a worker. Rows locked by other workers are skipped instead of waited on.
+    now = datetime.now()
+    
+    # Free queries whose claim expired (e.g. the worker crashed).
+    Query.update(claimState = ClaimState.FREE, claimedUntil = None).where(
+        (Query.claimState != ClaimState.FREE) &
+        (Query.claimedUntil < now)
+    ).execute()
+    
+    queries = (Query.update(claimState = state, claimedUntil = now + lease)
+        .where(Tuple(Query.url, Query.query).in_(claimableQueries(limit, **filters)))
+        .returning(Query)
+        .execute())
+    
+    return list(queries)
+
+def FailQuery(url: str, query: str, retryDelay: int, retryDelayMax: int) -> Query:
+    # Record a failed parse attempt. Each failure in a row doubles how long until the query may be claimed again.
+    query = Query.get(Query.url == url, Query.query == query)
+    
+    query.timeouts = (query.timeouts or 0) + 1
+    query.retryAfter = datetime.now() + timedelta(seconds = min(retryDelay * (2 ** (query.timeouts - 1)), retryDelayMax))
+    
+    query.save()
+    
+    return query
+
+def TimeoutQuery(url: str, query: str, retryDelay: int, retryDelayMax: int) -> Query:
+    # Timeouts back off like any other failed attempt.
+    return FailQuery(url, query, retryDelay, retryDelayMax)
+
+def ReleaseQueries(url: str, queries: list[str]):
+    if len(queries) < 1:
+        return
+    
+    Query.update(claimState = ClaimState.FREE, claimedUntil = None).where(
+        (Query.url == url) &
+        (Query.query << queries)
+    ).execute()
+    
+def GetQueryPayload(url: str, query: str) -> QueryPayload:
+    payload = QueryPayload.get_or_none(QueryPayload.url == url, QueryPayload.query == query)
+    
+    if payload is None:
+        payload = QueryPayload(url = url, query = query)
+        
+    return payload
+    
+def GetQueryPayloads(url: str, queries: list[str]) -> dict[str, QueryPayload]:
+    if len(queries) < 1:
+        return {}
+    
+    payloads = QueryPayload.select().where((QueryPayload.url == url) & (QueryPayload.query << queries))
+    
+    return { payload.query: payload for payload in payloads }
+    
+def SavePayload(payload: QueryPayload):
+    data = { field: getattr(payload, field.name) for field in QueryPayload._meta.sorted_fields if field.name not in ["url", "query"] }
+    
+    QueryPayload.insert(url = payload.url, query = payload.query, **{ field.name: value for field, value in data.items() }).on_conflict(
+        conflict_target = [QueryPayload.url, QueryPayload.query],
+        update = data
+    ).execute()
+    
+def SaveQuery(query: Query, payload: QueryPayload = None):
+    # Save the query and its payload together. The query row must exist before its payload.
+    with db.atomic():
+        query.save()
+        
+        if payload is not None:
+            SavePayload(payload)
+    
 def UpdateQuery(url: str, query: str, modId: int = None, lastParsed: datetime = None, allow: bool = None) -> Query:
     query = Query.get(Query.url == url, Query.query == query)
     
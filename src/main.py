@@ -1,9 +1,14 @@
 import argparse
+import signal
 import sys
-import time
+
+from threading import Event
 
 from debugger import debugMsg
-from parsers import SetupParsers
+from parsers import SetupParsers, Supervisor
+from api import ReconcileModCache
+
+import database
 
 from config import loadCfg, printCfg, getCfg
 
@@ -25,6 +30,12 @@ def main():
         default=False,
         action="store_true"
     )
+    
+    parser.add_argument("-r", "--reconcile",
+        help = "Prefill the mod cache from the Best Mods API and exit.",
+        default=False,
+        action="store_true"
+    )
 
     args = parser.parse_args()
     
@@ -46,21 +57,84 @@ def main():
         debugMsg(cfg, 0, "No binary path for Selenium. Exiting...")
         
         sys.exit(1)
+        
+    # Run database migrations once before any scraper process starts.
+    try:
+        db = cfg["database"]
+        
+        err = database.init(db["host"], db["name"], db["user"], db["pass"], db["port"],
+            maxConnections = db["maxConnections"],
+            staleTimeout = db["staleTimeout"],
+            poolTimeout = db["poolTimeout"],
+            retries = db["retries"],
+            retryBackoff = db["retryBackoff"])
+        
+        if err is not None:
+            raise err
+        
+        applied = database.setup()
+        
+        debugMsg(cfg, 1, f"Database schema at version {database.getSchemaVersion()} ({applied} migrations applied).")
+        
+        # Scraper processes are forked from here and must not inherit pooled connections.
+        database.closeAll()
+    except Exception as e:
+        debugMsg(cfg, 0, "Error migrating database.")
+        debugMsg(cfg, 0, e)
+        
+        sys.exit(1)
+        
+    if args.reconcile is True:
+        try:
+            cached = ReconcileModCache(cfg)
+            
+            debugMsg(cfg, 1, f"Reconciled mod cache ({cached} mods cached).")
+        except Exception as e:
+            debugMsg(cfg, 0, "Error reconciling mod cache.")
+            debugMsg(cfg, 0, e)
+            
+            sys.exit(1)
+        finally:
+            database.closeAll()
+            
+        return
+    
+    # Stop on SIGTERM or Ctrl+C. Scrapers finish in-flight work before exiting.
+    stop = Event()
+    
+    for sig in [signal.SIGTERM, signal.SIGINT]:
+        signal.signal(sig, lambda signum, frame: stop.set())
+    
+    sup = cfg["supervisor"]
+    
+    supervisor = Supervisor(cfg,
+        restartBackoff = sup["restartBackoff"],
+        restartBackoffMax = sup["restartBackoffMax"],
+        stableTime = sup["stableTime"],
+        stopTimeout = sup["stopTimeout"],
+        statusInterval = sup["statusInterval"])
     
     # Attempt to setup parsers.
     try:
-        SetupParsers(cfg)
+        SetupParsers(cfg, supervisor)
     except Exception as e:
         debugMsg(cfg, 0, "Error setting up parsers.")
         debugMsg(cfg, 0, e)
         
+        supervisor.Stop()
+        
         sys.exit(1)
     
-    try:
-        while True:
-            time.sleep(1)
-    except:
-        sys.exit(0)
+    # Restart scrapers that exit until we're told to stop.
+    while not stop.is_set():
+        supervisor.Poll()
+        
+        stop.wait(1)
+        
+    debugMsg(cfg, 1, "Stopping scrapers...")
+    
+    supervisor.Report()
+    supervisor.Stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,4 +1,5 @@
 __title__ = "Parsers"
 __version__ = "1.0.0"
 
-from .parsers import SetupParsers
\ No newline at end of file
+from .parsers import SetupParsers
+from .supervisor import Supervisor
\ No newline at end of file
@@ -0,0 +1,77 @@
+from random import uniform
+
+class AdaptiveCycle():
+    # Picks the delay and batch size for the next cycle of a loop from its backlog and how long the last cycle took.
+    intervalMin: float = 30
+    intervalMax: float = 60
+    busyIntervalMin: float = 5
+    idleIntervalMax: float = 3600
+    
+    limitMin: int = 1
+    limitMax: int = 1
+    
+    # Backlogs are counted up to this many cycles worth of work.
+    pressureCycles: int = 10
+    
+    def __init__(self,
+        intervalMin: float,
+        intervalMax: float,
+        busyIntervalMin: float = None,
+        idleIntervalMax: float = None,
+        limitMin: int = None,
+        limitMax: int = None
+    ):
+        self.intervalMin = max(0, intervalMin)
+        self.intervalMax = max(self.intervalMin, intervalMax)
+        
+        if busyIntervalMin is not None:
+            self.busyIntervalMin = max(0, busyIntervalMin)
+            
+        self.busyIntervalMin = min(self.busyIntervalMin, self.intervalMin)
+        
+        if idleIntervalMax is not None:
+            self.idleIntervalMax = idleIntervalMax
+            
+        self.idleIntervalMax = max(self.idleIntervalMax, self.intervalMax)
+        
+        if limitMin is not None:
+            self.limitMin = max(1, limitMin)
+            
+        if limitMax is not None:
+            self.limitMax = limitMax
+            
+        self.limitMax = max(self.limitMin, self.limitMax)
+        
+        self.limit = self.limitMin
+        self.idle = 0
+        
+    @property
+    def cap(self) -> int:
+        # The most backlog worth counting. Anything above this is treated as full pressure.
+        return self.limitMax * self.pressureCycles
+        
+    def Next(self, done: int, backlog: int, took: float) -> float:
+        # Nothing was done and nothing is waiting. Back off exponentially so idle loops barely touch the database.
+        if done < 1 and backlog < 1:
+            self.idle += 1
+            self.limit = self.limitMin
+            
+            return min(self.intervalMax * 2 ** (self.idle - 1), self.idleIntervalMax)
+            
+        self.idle = 0
+        
+        # Downstream (web drivers, the API) couldn't finish the last batch within a cycle. Shrink it.
+        if took > self.intervalMax:
+            self.limit = max(self.limitMin, self.limit // 2)
+        elif backlog > self.limit:
+            self.limit = min(self.limitMax, self.limit * 2)
+        elif backlog < self.limit:
+            self.limit = max(self.limitMin, backlog)
+            
+        if backlog < 1:
+            return uniform(self.intervalMin, self.intervalMax)
+            
+        # Shorten the delay towards busyIntervalMin as the backlog grows.
+        pressure = min(1.0, backlog / self.cap)
+        
+        return self.intervalMin - (self.intervalMin - self.busyIntervalMin) * pressure
\ No newline at end of file
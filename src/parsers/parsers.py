@@ -1,17 +1,24 @@
 import asyncio
+import signal
+import time
 from random import randint
 
-from multiprocessing import Process
 from importlib import import_module
 
 from debugger import debugMsg
 import database
 
+from webscraper.base import Status
+from webscraper.blocking import RESOURCE_TYPES, PAGE_LOAD_STRATEGIES
+
+from .adaptive import AdaptiveCycle
+from .supervisor import Supervisor
+
 from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver import Firefox
 
-def SetupParsers(cfg: dict[str, any]):
+def SetupParsers(cfg: dict[str, any], supervisor: Supervisor):
     # Make sure parsers exists in config.
     if "parsers" not in cfg:
         raise Exception("Parsers not found in config.")
@@ -174,8 +181,179 @@ def SetupParsers(cfg: dict[str, any]):
             if "avoidIds" in par:
                 avoidIds = list(par["avoidIds"])
                 
-            # We need to create a new process for this parser to initialize our web scraper.
-            p = Process(target=ScraperTarget, args=(cfg, scrMod.Webscraper,
+            # Driver pool size.
+            driverPoolSize = None
+            
+            if "driverPoolSize" in par:
+                driverPoolSize = int(par["driverPoolSize"])
+                
+            # HTTP fetch tier.
+            httpFirst = None
+            
+            if "httpFirst" in par:
+                httpFirst = bool(par["httpFirst"])
+                
+            httpTimeout = None
+            
+            if "httpTimeout" in par:
+                httpTimeout = int(par["httpTimeout"])
+                
+            findBatchSize = None
+            
+            if "findBatchSize" in par:
+                findBatchSize = int(par["findBatchSize"])
+                
+            # Per host politeness scheduler.
+            requestRate = None
+            
+            if "requestRate" in par:
+                requestRate = float(par["requestRate"])
+                
+            requestBurst = None
+            
+            if "requestBurst" in par:
+                requestBurst = int(par["requestBurst"])
+                
+            requestConcurrency = None
+            
+            if "requestConcurrency" in par:
+                requestConcurrency = int(par["requestConcurrency"])
+                
+            requestJitter = None
+            
+            if "requestJitter" in par:
+                requestJitter = float(par["requestJitter"])
+                
+            # Adaptive cycles size intervals and batches by the backlog.
+            adaptive = None
+            
+            if "adaptive" in par:
+                adaptive = bool(par["adaptive"])
+                
+            busyIntervalMin = None
+            
+            if "busyIntervalMin" in par:
+                busyIntervalMin = int(par["busyIntervalMin"])
+                
+            idleIntervalMax = None
+            
+            if "idleIntervalMax" in par:
+                idleIntervalMax = int(par["idleIntervalMax"])
+                
+            parseLimitMax = None
+            
+            if "parseLimitMax" in par:
+                parseLimitMax = int(par["parseLimitMax"])
+                
+            addLimitMax = None
+            
+            if "addLimitMax" in par:
+                addLimitMax = int(par["addLimitMax"])
+                
+            reparseAfter = None
+            
+            if "reparseAfter" in par:
+                reparseAfter = int(par["reparseAfter"])
+                
+            # Wake parse and add cycles through Postgres notifications.
+            listen = None
+            
+            if "listen" in par:
+                listen = bool(par["listen"])
+                
+            notifyDelay = None
+            
+            if "notifyDelay" in par:
+                notifyDelay = float(par["notifyDelay"])
+                
+            # Driver recycling.
+            driverRecyclePages = None
+            
+            if "driverRecyclePages" in par:
+                driverRecyclePages = int(par["driverRecyclePages"])
+                
+            driverRecycleRss = None
+            
+            if "driverRecycleRss" in par:
+                driverRecycleRss = int(par["driverRecycleRss"])
+                
+            driverWarmSpare = None
+            
+            if "driverWarmSpare" in par:
+                driverWarmSpare = bool(par["driverWarmSpare"])
+                
+            # Timeouts.
+            pageLoadTimeout = None
+            
+            if "pageLoadTimeout" in par:
+                pageLoadTimeout = int(par["pageLoadTimeout"])
+                
+            scriptTimeout = None
+            
+            if "scriptTimeout" in par:
+                scriptTimeout = int(par["scriptTimeout"])
+                
+            modTimeout = None
+            
+            if "modTimeout" in par:
+                modTimeout = int(par["modTimeout"])
+                
+            timeoutRetryDelay = None
+            
+            if "timeoutRetryDelay" in par:
+                timeoutRetryDelay = int(par["timeoutRetryDelay"])
+                
+            # Resource blocking.
+            blockResources = None
+            
+            if "blockResources" in par:
+                blockResources = []
+                
+                # A bad entry would stop every web driver from launching. Skip it instead.
+                for resource in par["blockResources"]:
+                    if resource not in RESOURCE_TYPES:
+                        debugMsg(cfg, 0, f"[Scraper {scrName}] Unknown resource type '{resource}' in blockResources. Skipping...")
+                        
+                        continue
+                    
+                    blockResources.append(resource)
+                
+            blockHosts = None
+            
+            if "blockHosts" in par:
+                blockHosts = list(par["blockHosts"])
+                
+            allowHosts = None
+            
+            if "allowHosts" in par:
+                allowHosts = list(par["allowHosts"])
+                
+            pageLoadStrategy = None
+            
+            if "pageLoadStrategy" in par:
+                if par["pageLoadStrategy"] in PAGE_LOAD_STRATEGIES:
+                    pageLoadStrategy = str(par["pageLoadStrategy"])
+                else:
+                    debugMsg(cfg, 0, f"[Scraper {scrName}] Unknown page load strategy '{par['pageLoadStrategy']}'. Using the default...")
+                
+            # Persistent browser profiles.
+            profilePath = None
+            
+            if "profilePath" in par:
+                profilePath = str(par["profilePath"])
+                
+            profileCacheSize = None
+            
+            if "profileCacheSize" in par:
+                profileCacheSize = int(par["profileCacheSize"])
+                
+            persistCookies = None
+            
+            if "persistCookies" in par:
+                persistCookies = bool(par["persistCookies"])
+                
+            # We need to create a new process for this parser to initialize our web scraper. The supervisor restarts it if it exits.
+            supervisor.Add(f"{scrName}::{url}", target=ScraperTarget, args=(cfg, scrMod.Webscraper,
                 scrName,
                 url,
                 protocol,
@@ -198,9 +376,38 @@ def SetupParsers(cfg: dict[str, any]):
                 skipNullCategory,
                 logPageFailOutput,
                 cleanupBanners,
-                avoidIds
+                avoidIds,
+                driverPoolSize,
+                httpFirst,
+                httpTimeout,
+                findBatchSize,
+                requestRate,
+                requestBurst,
+                requestConcurrency,
+                requestJitter,
+                adaptive,
+                busyIntervalMin,
+                idleIntervalMax,
+                parseLimitMax,
+                addLimitMax,
+                listen,
+                notifyDelay,
+                driverRecyclePages,
+                driverRecycleRss,
+                driverWarmSpare,
+                pageLoadTimeout,
+                scriptTimeout,
+                modTimeout,
+                timeoutRetryDelay,
+                blockResources,
+                blockHosts,
+                allowHosts,
+                pageLoadStrategy,
+                profilePath,
+                profileCacheSize,
+                persistCookies,
+                reparseAfter
             ))
-            p.start()
         except Exception as e:
             print(f"[Scraper {scrName}] Failed to import module. Skipping...")
             print(e)
@@ -238,88 +445,259 @@ def ScraperTarget(cfg, cls,
     skipNullCategory: bool = None,
     logPageFailOutput: bool = None,
     cleanupBanners: bool = None,
-    avoidIds: list[str] = None
+    avoidIds: list[str] = None,
+    
+    driverPoolSize: int = None,
+    httpFirst: bool = None,
+    httpTimeout: int = None,
+    findBatchSize: int = None,
+    requestRate: float = None,
+    requestBurst: int = None,
+    requestConcurrency: int = None,
+    requestJitter: float = None,
+    adaptive: bool = None,
+    busyIntervalMin: int = None,
+    idleIntervalMax: int = None,
+    parseLimitMax: int = None,
+    addLimitMax: int = None,
+    listen: bool = None,
+    notifyDelay: float = None,
+    driverRecyclePages: int = None,
+    driverRecycleRss: int = None,
+    driverWarmSpare: bool = None,
+    pageLoadTimeout: int = None,
+    scriptTimeout: int = None,
+    modTimeout: int = None,
+    timeoutRetryDelay: int = None,
+    blockResources: list[str] = None,
+    blockHosts: list[str] = None,
+    allowHosts: list[str] = None,
+    pageLoadStrategy: str = None,
+    profilePath: str = None,
+    profileCacheSize: int = None,
+    persistCookies: bool = None,
+    reparseAfter: int = None
 ):
+    # Scrapers are forked from the supervisor. Don't keep its signal handlers. Until our tasks run, stopping just unwinds so drivers are quit.
+    signal.signal(signal.SIGTERM, exitTarget)
+    signal.signal(signal.SIGINT, exitTarget)
+    
     debugMsg(cfg, 1, f"[Scraper {scrName}] Starting web scraper...")
     
     # Connect to database.
     db = cfg["database"]
-    database.init(db["host"], db["name"], db["user"], db["pass"], db["port"])
+    database.init(db["host"], db["name"], db["user"], db["pass"], db["port"],
+        maxConnections = db["maxConnections"],
+        staleTimeout = db["staleTimeout"],
+        poolTimeout = db["poolTimeout"],
+        retries = db["retries"],
+        retryBackoff = db["retryBackoff"])
+    
+    scraper = None
     
     try:
-        # Initialize class.
-        scraper = cls(cfg,
-            url = url,
-            protocol = protocol,
-            cats = cats,
-            catsChildren = catsChildren,
-            
-            findEnabled = findEnabled,
-            findIntervalMin = findIntervalMin,
-            findIntervalMax = findIntervalMax,
-            
-            parseEnabled = parseEnabled,
-            parseIntervalMin = parseIntervalMin,
-            parseIntervalMax = parseIntervalMax,
-            parseExisting = parseExisting,
-            parseNew = parseNew,
-            
-            addEnabled = addEnabled,
-            addIntervalMin = addIntervalMin,
-            addIntervalMax = addIntervalMax,
-            addExisting = addExisting,
-            addNew = addNew,
-            
-            testMode = testMode,
-            skipNullCategory = skipNullCategory,
-            logPageFailOutput = logPageFailOutput,
-            cleanupBanners = cleanupBanners,
-            avoidIds = avoidIds
-        )
-        
-        # Setup web driver.
-        scraper.setupDriver()
-    except Exception as e:
-        debugMsg(cfg, 0, f"[Scraper {scrName}] Error initializing web driver. Aborting web scraper process...")
-        debugMsg(cfg, 0, e)
+        try:
+            # Initialize class.
+            scraper = cls(cfg,
+                url = url,
+                protocol = protocol,
+                cats = cats,
+                catsChildren = catsChildren,
+                
+                findEnabled = findEnabled,
+                findIntervalMin = findIntervalMin,
+                findIntervalMax = findIntervalMax,
+                
+                parseEnabled = parseEnabled,
+                parseIntervalMin = parseIntervalMin,
+                parseIntervalMax = parseIntervalMax,
+                parseExisting = parseExisting,
+                parseNew = parseNew,
+                
+                addEnabled = addEnabled,
+                addIntervalMin = addIntervalMin,
+                addIntervalMax = addIntervalMax,
+                addExisting = addExisting,
+                addNew = addNew,
+                
+                testMode = testMode,
+                skipNullCategory = skipNullCategory,
+                logPageFailOutput = logPageFailOutput,
+                cleanupBanners = cleanupBanners,
+                avoidIds = avoidIds,
+                
+                driverPoolSize = driverPoolSize,
+                httpFirst = httpFirst,
+                httpTimeout = httpTimeout,
+                findBatchSize = findBatchSize,
+                requestRate = requestRate,
+                requestBurst = requestBurst,
+                requestConcurrency = requestConcurrency,
+                requestJitter = requestJitter,
+                adaptive = adaptive,
+                busyIntervalMin = busyIntervalMin,
+                idleIntervalMax = idleIntervalMax,
+                parseLimitMax = parseLimitMax,
+                addLimitMax = addLimitMax,
+                listen = listen,
+                notifyDelay = notifyDelay,
+                driverRecyclePages = driverRecyclePages,
+                driverRecycleRss = driverRecycleRss,
+                driverWarmSpare = driverWarmSpare,
+                pageLoadTimeout = pageLoadTimeout,
+                scriptTimeout = scriptTimeout,
+                modTimeout = modTimeout,
+                timeoutRetryDelay = timeoutRetryDelay,
+                blockResources = blockResources,
+                blockHosts = blockHosts,
+                allowHosts = allowHosts,
+                pageLoadStrategy = pageLoadStrategy,
+                profilePath = profilePath,
+                profileCacheSize = profileCacheSize,
+                persistCookies = persistCookies,
+                reparseAfter = reparseAfter
+            )
+            
+            # Setup web driver.
+            scraper.setupDriver()
+        except Exception as e:
+            debugMsg(cfg, 0, f"[Scraper {scrName}] Error initializing web driver. Aborting web scraper process...")
+            debugMsg(cfg, 0, e)
+            
+            return
         
-        return
-    
-    # Run web scraper tasks.
-    asyncio.run(ScraperTasks(scraper))
-    
-    driver.quit()
+        # Run web scraper tasks.
+        asyncio.run(ScraperTasks(scraper))
+    finally:
+        if scraper is not None:
+            scraper.Close()
+            
+def exitTarget(signum, frame):
+    raise SystemExit(0)
 
 async def ScraperTasks(scraper):
+    if scraper.listen:
+        scraper.listener = database.Listener(scraper.url, [database.PARSE_CHANNEL, database.ADD_CHANNEL])
+        
+        try:
+            scraper.listener.Start()
+        except Exception as e:
+            debugMsg(scraper.cfg, 0, f"[{scraper.tag}] Error listening for notifications. Polling until reconnected...")
+            debugMsg(scraper.cfg, 0, e)
+            
     tasks = [
         asyncio.create_task(findMods(scraper)),
         asyncio.create_task(parseMods(scraper)),
         asyncio.create_task(addMods(scraper))
     ]
     
+    def stop():
+        debugMsg(scraper.cfg, 1, f"[{scraper.tag}] Stopping. Finishing in-flight work...")
+        
+        # Stages already running see the status and skip what they haven't started.
+        scraper.status = Status.STOPPING
+        
+        for task in tasks:
+            task.cancel()
+            
+    loop = asyncio.get_running_loop()
+    
+    for sig in [signal.SIGTERM, signal.SIGINT]:
+        loop.add_signal_handler(sig, stop)
+    
     try:
         await asyncio.gather(*tasks)
     except asyncio.CancelledError:
+        pass
+    finally:
+        # Wait for work already handed to the stage threads so claims are released and results saved.
+        scraper.stages.Shutdown(wait = True)
+        
+        if scraper.listener is not None:
+            scraper.listener.Stop()
+    
+def newCycle(scraper, intervalMin: int, intervalMax: int, limitMin: int = None, limitMax: int = None) -> AdaptiveCycle:
+    if not scraper.adaptive:
+        return None
+    
+    return AdaptiveCycle(intervalMin, intervalMax,
+        busyIntervalMin = scraper.busyIntervalMin,
+        idleIntervalMax = scraper.idleIntervalMax,
+        limitMin = limitMin,
+        limitMax = limitMax
+    )
+
+async def waitCycle(scraper, channel: str, delay: float):
+    # Sleep until the next cycle or until the stage before us hands work over.
+    if scraper.listener is None:
+        await asyncio.sleep(delay)
+        
         return
     
+    if await scraper.listener.Wait(channel, delay):
+        debugMsg(scraper.cfg, 5, f"[{scraper.tag}] Woken by '{channel}' notification.")
+        
+        # Let a burst of notifications settle so they're handled in one cycle.
+        await asyncio.sleep(scraper.notifyDelay)
+
 async def findMods(scraper):
+    cycle = newCycle(scraper, scraper.findIntervalMin, scraper.findIntervalMax)
+    
     while True:
-        await scraper.FindMods()
+        start = time.monotonic()
+        
+        added = await scraper.FindMods()
         
-        delay = randint(scraper.findIntervalMin, scraper.findIntervalMax)
+        if cycle is not None:
+            # Find has no backlog of its own. Back off while no new queries turn up.
+            delay = cycle.Next(added, 0, time.monotonic() - start)
+        else:
+            delay = randint(scraper.findIntervalMin, scraper.findIntervalMax)
+            
         await asyncio.sleep(delay)
 
 async def parseMods(scraper):
+    cycle = newCycle(scraper, scraper.parseIntervalMin, scraper.parseIntervalMax,
+        limitMin = max(scraper.limit, scraper.driverPoolSize),
+        limitMax = scraper.parseLimitMax
+    )
+    
     while True:
-        await scraper.ParseMods()
+        start = time.monotonic()
         
-        delay = randint(scraper.parseIntervalMin, scraper.parseIntervalMax)
-        await asyncio.sleep(delay)
+        parsed = await scraper.ParseMods()
+        
+        if cycle is not None:
+            backlog = await scraper.stages.Run("parse", scraper.ParseBacklog, cycle.cap)
+            
+            delay = cycle.Next(parsed, backlog, time.monotonic() - start)
+            
+            scraper.parseLimit = cycle.limit
+        else:
+            delay = randint(scraper.parseIntervalMin, scraper.parseIntervalMax)
+            
+        await waitCycle(scraper, database.PARSE_CHANNEL, delay)
         
 async def addMods(scraper):
+    apiInfo = scraper.cfg["api"]
+    
+    cycle = newCycle(scraper, scraper.addIntervalMin, scraper.addIntervalMax,
+        limitMin = apiInfo["limit"],
+        limitMax = scraper.addLimitMax
+    )
+    
     while True:
-        await scraper.AddMods()
+        start = time.monotonic()
         
-        delay = randint(scraper.addIntervalMin, scraper.addIntervalMax)
-        await asyncio.sleep(delay)
-        
\ No newline at end of file
+        added = await scraper.AddMods()
+        
+        if cycle is not None:
+            backlog = await scraper.stages.Run("add", scraper.AddBacklog, cycle.cap)
+            
+            delay = cycle.Next(added, backlog, time.monotonic() - start)
+            
+            scraper.addLimit = cycle.limit
+        else:
+            delay = randint(scraper.addIntervalMin, scraper.addIntervalMax)
+            
+        await waitCycle(scraper, database.ADD_CHANNEL, delay)
@@ -0,0 +1,150 @@
+import time
+
+from multiprocessing import Process
+from typing import Callable
+
+from debugger import debugMsg
+
+class Worker():
+    def __init__(self, name: str, target: Callable, args: tuple):
+        self.name = name
+        self.target = target
+        self.args = args
+        
+        self.process: Process = None
+        self.started = 0.0
+        self.restarts = 0
+        self.failures = 0
+        self.restartAt: float = None
+        
+    @property
+    def uptime(self) -> float:
+        if self.process is None or not self.process.is_alive():
+            return 0.0
+            
+        return time.monotonic() - self.started
+
+class Supervisor():
+    # Keeps a process running per parser, restarting them with backoff when they exit.
+    cfg: dict[str, any] = None
+    
+    restartBackoff: float = 5
+    restartBackoffMax: float = 300
+    
+    # A process that ran at least this long before exiting is restarted without backoff.
+    stableTime: float = 600
+    
+    stopTimeout: float = 60
+    statusInterval: float = 300
+    
+    def __init__(self, cfg: dict[str, any],
+        restartBackoff: float = None,
+        restartBackoffMax: float = None,
+        stableTime: float = None,
+        stopTimeout: float = None,
+        statusInterval: float = None
+    ):
+        self.cfg = cfg
+        
+        if restartBackoff is not None:
+            self.restartBackoff = restartBackoff
+            
+        if restartBackoffMax is not None:
+            self.restartBackoffMax = restartBackoffMax
+            
+        if stableTime is not None:
+            self.stableTime = stableTime
+            
+        if stopTimeout is not None:
+            self.stopTimeout = stopTimeout
+            
+        if statusInterval is not None:
+            self.statusInterval = statusInterval
+            
+        self.workers: list[Worker] = []
+        self.reported = time.monotonic()
+        
+    def Add(self, name: str, target: Callable, args: tuple) -> Worker:
+        worker = Worker(name, target, args)
+        
+        self.workers.append(worker)
+        
+        self.start(worker)
+        
+        return worker
+        
+    def start(self, worker: Worker):
+        # Processes can't be started twice. Every (re)start gets a new one.
+        worker.process = Process(target = worker.target, args = worker.args, name = worker.name)
+        worker.process.start()
+        
+        worker.started = time.monotonic()
+        worker.restartAt = None
+        
+        debugMsg(self.cfg, 2, f"[Supervisor] Started '{worker.name}' (PID {worker.process.pid}).")
+        
+    def exited(self, worker: Worker):
+        now = time.monotonic()
+        uptime = now - worker.started
+        
+        if uptime >= self.stableTime:
+            worker.failures = 0
+            
+        delay = min(self.restartBackoff * (2 ** worker.failures), self.restartBackoffMax)
+        
+        worker.failures += 1
+        worker.restartAt = now + delay
+        
+        debugMsg(self.cfg, 0, f"[Supervisor] '{worker.name}' exited with code {worker.process.exitcode} after {uptime:.0f} seconds. Restarting in {delay:.1f} seconds...")
+        
+    def Poll(self):
+        now = time.monotonic()
+        
+        for worker in self.workers:
+            if worker.process.is_alive():
+                continue
+                
+            if worker.restartAt is None:
+                self.exited(worker)
+            elif now >= worker.restartAt:
+                worker.restarts += 1
+                
+                try:
+                    self.start(worker)
+                except Exception as e:
+                    debugMsg(self.cfg, 0, f"[Supervisor] Failed to restart '{worker.name}'.")
+                    debugMsg(self.cfg, 0, e)
+                    
+                    self.exited(worker)
+                    
+        if self.statusInterval > 0 and now - self.reported >= self.statusInterval:
+            self.Report()
+            
+    def Report(self):
+        self.reported = time.monotonic()
+        
+        for worker in self.workers:
+            if worker.process.is_alive():
+                debugMsg(self.cfg, 1, f"[Supervisor] '{worker.name}' (PID {worker.process.pid}) up {worker.uptime:.0f} seconds, {worker.restarts} restarts.")
+            else:
+                debugMsg(self.cfg, 1, f"[Supervisor] '{worker.name}' down, {worker.restarts} restarts.")
+                
+    def Stop(self):
+        # Ask every process to drain in-flight work and quit its drivers, then kill whatever is left after the timeout.
+        alive = [worker for worker in self.workers if worker.process is not None and worker.process.is_alive()]
+        
+        for worker in alive:
+            worker.process.terminate()
+            
+        deadline = time.monotonic() + self.stopTimeout
+        
+        for worker in alive:
+            worker.process.join(max(0, deadline - time.monotonic()))
+            
+            if worker.process.is_alive():
+                debugMsg(self.cfg, 0, f"[Supervisor] '{worker.name}' didn't stop within {self.stopTimeout} seconds. Killing...")
+                
+                worker.process.kill()
+                worker.process.join()
+                
+        debugMsg(self.cfg, 1, f"[Supervisor] Stopped {len(alive)} scraper processes.")
\ No newline at end of file
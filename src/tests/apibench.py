@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from api import ModApi
+from apiserver import Serve
+
+# Compares single and batch API calls against the stand-in server. No database needed.
+# Usage: python3 src/tests/apibench.py [mods] [latency ms]
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+
+srcUrl = "example.com"
+
+def newApi(server) -> ModApi:
+    return ModApi({
+        "debug": 0,
+        "api": {
+            "host": f"http://127.0.0.1:{server.server_port}",
+            "token": None,
+            "batchSize": 50
+        }
+    })
+
+def buildMods(ids: list[int]) -> list[dict]:
+    return [{
+        "id": ids[i],
+        "url": f"mod-{i}",
+        "name": f"Mod {i}",
+        "description": f"Description for mod {i}.",
+        "sources": [{ "sourceUrl": srcUrl, "query": f"/mod/{i}" }]
+    } for i in range(count)]
+
+def lookupIds(resps: list) -> list[int]:
+    ids = []
+    
+    for resp in resps:
+        data = resp.json()["data"] if resp.status_code == 200 else None
+        
+        ids.append(int(data[0]["id"]) if data else None)
+        
+    return ids
+
+def runSingle(api: ModApi) -> list[int]:
+    ids = lookupIds([api.GetMod(None, srcUrl, f"/mod/{i}") for i in range(count)])
+    
+    resps = [api.UpdateOrAddMod(**mod) for mod in buildMods(ids)]
+    
+    return [resp.json()["data"]["id"] for resp in resps if resp.status_code == 200]
+
+def runBatch(api: ModApi) -> list[int]:
+    ids = lookupIds(api.GetMods([(srcUrl, f"/mod/{i}") for i in range(count)]))
+    
+    resps = api.UpdateOrAddMods(buildMods(ids))
+    
+    return [resp.json()["data"]["id"] for resp in resps if resp.status_code == 200]
+
+def bench(label: str, batch: bool, func):
+    server = Serve(batch = batch, latency = latency)
+    api = newApi(server)
+    
+    # First pass adds every mod. The second finds and updates them.
+    for run in ["add", "update"]:
+        server.RequestHandlerClass.store.requests = 0
+        
+        start = time.time()
+        
+        ids = func(api)
+        
+        took = time.time() - start
+        
+        assert len(ids) == count, f"{label}: only {len(ids)}/{count} mods saved"
+        assert len(server.RequestHandlerClass.store.mods) == count, f"{label}: duplicate mods created"
+        
+        print(f"{label:<26} {run:<7} {took:7.2f}s {server.RequestHandlerClass.store.requests:6} requests {count / took:9.1f} mods/s")
+        
+    server.shutdown()
+    
+    return api
+
+print(f"{count} mods, {latency * 1000:.0f} ms simulated latency.\n")
+
+bench("single", True, runSingle)
+bench("batch", True, runBatch)
+
+api = bench("batch (no server support)", False, runBatch)
+
+assert api.batchSupported is False, "batch support wasn't detected as missing"
\ No newline at end of file
@@ -0,0 +1,170 @@
+import json
+import sys
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Lock
+from urllib.parse import urlparse, parse_qs
+
+# Stand-in for the Best Mods content API so the API client can be tested and benchmarked offline.
+# Usage: python3 src/tests/apiserver.py [port] [--no-batch] [--latency <ms>]
+endPoint = "/api/content/mod"
+
+class ModStore():
+    def __init__(self):
+        self.mods: dict[int, dict] = {}
+        self.sources: dict[tuple[str, str], int] = {}
+        self.nextId = 1
+        self.requests = 0
+        self.lock = Lock()
+        
+    def find(self, srcUrl: str, srcQuery: str) -> list[dict]:
+        with self.lock:
+            id = self.sources.get((srcUrl, srcQuery))
+            
+            return [self.mods[id]] if id is not None else []
+        
+    def save(self, data: dict, id: int = None) -> tuple[int, dict]:
+        with self.lock:
+            if id is None:
+                if not data.get("name") or not data.get("url") or not data.get("description"):
+                    return 400, { "message": "Name, URL, or description not set." }
+                
+                id = self.nextId
+                self.nextId += 1
+                
+                self.mods[id] = { "id": id, "autoUpdate": True }
+            elif id not in self.mods:
+                return 404, { "message": f"Mod {id} not found." }
+            
+            mod = self.mods[id]
+            mod.update(data)
+            
+            for src in data.get("sources") or []:
+                self.sources[(src["sourceUrl"], src["query"])] = id
+                
+            return 200, { "data": mod }
+        
+class Handler(BaseHTTPRequestHandler):
+    # Keep connections alive like the real API.
+    protocol_version = "HTTP/1.1"
+    
+    # Send headers and body in one write so small responses aren't held back by delayed ACKs.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    
+    store: ModStore = None
+    batch: bool = True
+    latency: float = 0
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def reply(self, status: int, body: dict):
+        out = json.dumps(body).encode()
+        
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+        
+    def begin(self) -> tuple[str, dict]:
+        self.store.requests += 1
+        
+        # Simulate the round trip to a remote server.
+        if self.latency > 0:
+            time.sleep(self.latency)
+            
+        url = urlparse(self.path)
+        
+        return url.path, { key: value[0] for key, value in parse_qs(url.query).items() }
+    
+    def body(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        
+        return json.loads(self.rfile.read(length) or b"{}")
+    
+    def do_GET(self):
+        path, params = self.begin()
+        
+        if path != endPoint:
+            return self.reply(404, { "message": "Not found." })
+        
+        if "id" in params:
+            mod = self.store.mods.get(int(params["id"]))
+            
+            return self.reply(200, { "data": [mod] if mod else [] })
+        
+        self.reply(200, { "data": self.store.find(params.get("srcUrl"), params.get("srcQuery")) })
+        
+    def do_POST(self):
+        path, _ = self.begin()
+        
+        body = self.body()
+        
+        if path == endPoint:
+            return self.reply(*self.store.save(body))
+        
+        if not self.batch or path not in [f"{endPoint}/lookup", f"{endPoint}/batch"]:
+            return self.reply(404, { "message": "Not found." })
+        
+        results = []
+        
+        for item in body.get("items", []):
+            if path.endswith("/lookup"):
+                results.append({ "status": 200, "body": { "data": self.store.find(item.get("srcUrl"), item.get("srcQuery")) } })
+            else:
+                id = item.pop("id", None)
+                
+                status, res = self.store.save(item, id)
+                
+                results.append({ "status": status, "body": res })
+                
+        self.reply(200, { "data": results })
+        
+    def do_PUT(self):
+        path, params = self.begin()
+        
+        if path != endPoint or "id" not in params:
+            return self.reply(404, { "message": "Not found." })
+        
+        self.reply(*self.store.save(self.body(), int(params["id"])))
+        
+    def do_DELETE(self):
+        path, params = self.begin()
+        
+        with self.store.lock:
+            mod = self.store.mods.pop(int(params.get("id", 0)), None)
+            
+        if path != endPoint or mod is None:
+            return self.reply(404, { "message": "Not found." })
+        
+        self.reply(200, { "data": mod })
+        
+def Serve(port: int = 0, batch: bool = True, latency: float = 0) -> ThreadingHTTPServer:
+    # Starts the server on a background thread. Port 0 picks a free port.
+    handler = type("StandInHandler", (Handler,), { "store": ModStore(), "batch": batch, "latency": latency })
+    
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    
+    Thread(target = server.serve_forever, daemon = True).start()
+    
+    return server
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    
+    port = int(args[0]) if len(args) > 0 and args[0].isdigit() else 8080
+    latency = float(args[args.index("--latency") + 1]) / 1000 if "--latency" in args else 0
+    
+    server = Serve(port, "--no-batch" not in args, latency)
+    
+    print(f"Stand-in API listening on http://127.0.0.1:{server.server_port}{endPoint}")
+    
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
\ No newline at end of file
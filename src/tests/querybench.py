@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import config
+import database
+from database.migrations import HOT_INDEXES
+from database.query.query import claimableQueries
+
+# Usage: python3 src/tests/querybench.py [settings.json] [rows]
+path = sys.argv[1] if len(sys.argv) > 1 else "settings.json"
+rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+
+# Synthetic tables live in their own schema under the real names so the SQL our claim code generates runs against them unchanged.
+schema = "query_bench"
+
+config.loadCfg(path)
+cfg = config.getCfg()
+dbInfo = cfg["database"]
+
+err = database.init(dbInfo["host"], dbInfo["name"], dbInfo["user"], dbInfo["pass"], dbInfo["port"],
+    maxConnections = dbInfo["maxConnections"],
+    staleTimeout = dbInfo["staleTimeout"],
+    poolTimeout = dbInfo["poolTimeout"],
+    retries = dbInfo["retries"],
+    retryBackoff = dbInfo["retryBackoff"])
+
+if err is not None:
+    print("Failed to connect to database!")
+    print(err)
+    
+    sys.exit(1)
+
+db = database.connection.db
+
+def run(sql: str, params: tuple = None):
+    cursor = db.execute_sql(sql, params)
+    
+    if cursor.description is None:
+        return []
+        
+    return cursor.fetchall()
+
+# The statements GetQueries() and ClaimQueries() send on every cycle, generated from the same filters the scrapers use.
+claims = {
+    "parse claim": claimableQueries(10, url = "source1", allow = True, retryReady = True),
+    "parse new claim": claimableQueries(10, url = "source1", allow = True, exists = False, retryReady = True),
+    "parse existing claim": claimableQueries(10, url = "source1", allow = True, exists = True, cats = [1, 2, 3, 4, 5], retryReady = True),
+    "add claim": claimableQueries(5, url = "source1", needsUpdating = True, allow = True, nameNotNull = True, descNotNull = True, viewUrlNotNull = True)
+}
+
+hotQueries = {
+    "parse (old random order)": ('SELECT url_id, query FROM query WHERE url_id = \'source1\' AND allow ORDER BY "lastParsed" ASC NULLS FIRST, random() LIMIT 10', None)
+}
+
+for name, query in claims.items():
+    hotQueries[name] = query.sql()
+
+def explain(label: str):
+    print(f"===== {label} =====")
+    
+    for name, (sql, params) in hotQueries.items():
+        plan = [row[0] for row in run(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)]
+        
+        print(f"--- {name} ---")
+        
+        for line in plan:
+            print(line)
+            
+        print()
+
+print(f"Creating synthetic tables in schema '{schema}' with {rows} rows...")
+
+start = time.time()
+
+run(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+run(f"CREATE SCHEMA {schema}")
+run(f"CREATE TABLE {schema}.query (LIKE public.query INCLUDING DEFAULTS)")
+run(f"ALTER TABLE {schema}.query ADD PRIMARY KEY (url_id, query)")
+run(f"CREATE TABLE {schema}.query_payload (LIKE public.query_payload INCLUDING DEFAULTS)")
+run(f"ALTER TABLE {schema}.query_payload ADD PRIMARY KEY (url, query)")
+run(f"SET search_path TO {schema}, public")
+
+# 5 sources, 30% never parsed, 20% needing updates, 60% existing on Best Mods, 2% not allowed.
+run(f"""INSERT INTO {schema}.query (url_id, query, "modId", "lastParsed", allow, "needsUpdating", "viewUrl", "categoryId", name, "claimState")
+    SELECT 'source' || (i % 5), '/cat/mod/' || i,
+        CASE WHEN i % 10 < 6 THEN i ELSE NULL END,
+        CASE WHEN i % 10 >= 7 THEN NULL ELSE now() - (i % 86400) * interval '1 second' END,
+        i % 50 <> 0,
+        i % 5 = 1,
+        'mod-' || i,
+        i % 50,
+        'Mod ' || i,
+        0
+    FROM generate_series(1, {rows}) i""")
+
+# Parsed mods have a payload. 5% of them without a description.
+run(f"""INSERT INTO {schema}.query_payload (url, query, description)
+    SELECT 'source' || (i % 5), '/cat/mod/' || i,
+        CASE WHEN i % 20 = 0 THEN NULL ELSE 'Description of mod ' || i END
+    FROM generate_series(1, {rows}) i
+    WHERE i % 10 < 7""")
+
+run(f"ANALYZE {schema}.query")
+run(f"ANALYZE {schema}.query_payload")
+
+print(f"Created tables in {time.time() - start:.1f} seconds.\n")
+
+explain("Before partial indexes")
+
+start = time.time()
+
+for name, sql in HOT_INDEXES.items():
+    run(sql.format(name = name, table = f"{schema}.query"))
+
+run(f"ANALYZE {schema}.query")
+
+print(f"Created partial indexes in {time.time() - start:.1f} seconds.\n")
+
+explain("After partial indexes")
+
+run(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+
+database.close()
\ No newline at end of file
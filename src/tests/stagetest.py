@@ -0,0 +1,103 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from webscraper.base import Webscraper
+from webscraper.stages import StageExecutors
+
+# Shows the find, parse and add stages overlap instead of serializing on the event loop. No database or web driver needed.
+# Usage: python3 src/tests/stagetest.py [seconds per stage]
+work = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+
+class SlowScraper(Webscraper):
+    # Each stage blocks like a page load, a database claim or an API request would.
+    def __init__(self):
+        self.cfg = { "debug": 0, "logFile": None }
+        self.stages = StageExecutors()
+        
+        self.spans: dict[str, tuple[float, float]] = {}
+        
+    def block(self, stage: str) -> int:
+        start = time.monotonic()
+        
+        time.sleep(work)
+        
+        self.spans[stage] = (start, time.monotonic())
+        
+        return 1
+        
+    def runFindMods(self) -> int:
+        return self.block("find")
+        
+    def runParseMods(self) -> int:
+        return self.block("parse")
+        
+    def runAddMods(self) -> int:
+        return self.block("add")
+
+class InlineScraper(SlowScraper):
+    # The old behavior: blocking stage bodies run directly on the event loop.
+    async def FindMods(self):
+        return self.runFindMods()
+        
+    async def ParseMods(self):
+        return self.runParseMods()
+        
+    async def AddMods(self):
+        return self.runAddMods()
+
+async def heartbeat(stop: asyncio.Event) -> float:
+    # The longest the event loop went without running us.
+    worst = 0.0
+    
+    while not stop.is_set():
+        start = time.monotonic()
+        
+        await asyncio.sleep(0.01)
+        
+        worst = max(worst, time.monotonic() - start - 0.01)
+        
+    return worst
+
+async def runStages(scraper: SlowScraper) -> tuple[float, float]:
+    stop = asyncio.Event()
+    
+    beat = asyncio.create_task(heartbeat(stop))
+    
+    start = time.monotonic()
+    
+    await asyncio.gather(scraper.FindMods(), scraper.ParseMods(), scraper.AddMods())
+    
+    took = time.monotonic() - start
+    
+    stop.set()
+    
+    return took, await beat
+
+def overlaps(spans: dict[str, tuple[float, float]]) -> bool:
+    starts = [span[0] for span in spans.values()]
+    ends = [span[1] for span in spans.values()]
+    
+    return max(starts) < min(ends)
+
+def run(label: str, scraper: SlowScraper) -> float:
+    took, lag = asyncio.run(runStages(scraper))
+    
+    scraper.stages.Shutdown()
+    
+    print(f"{label}: stages took {took:.2f}s, longest event loop stall {lag:.2f}s, overlapping => {overlaps(scraper.spans)}")
+    
+    return took
+
+inline = run("Inline", InlineScraper())
+staged = run("Stage executors", SlowScraper())
+
+if staged > work * 1.5:
+    print(f"FAIL: stages didn't overlap ({staged:.2f}s for {work:.2f}s of work each).")
+    
+    sys.exit(1)
+
+print(f"OK: {inline / staged:.1f}x faster with stage executors.")
\ No newline at end of file
@@ -2,4 +2,7 @@ __title__ = "Utils"
 __version__ = "1.0.0"
 
 from .url import ConvertToUrl, PathHas, GetPath
-from .text import LimitText, FindShortDesc
\ No newline at end of file
+from .text import LimitText, FindShortDesc
+from .iter import Batch
+from .hash import Fingerprint
+from .proc import ProcessTree, ProcessTreeRss, KillProcessTree
\ No newline at end of file
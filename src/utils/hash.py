@@ -0,0 +1,11 @@
+import hashlib
+import json
+
+def Fingerprint(value) -> str:
+    # Stable hash of a parsed value. Lists and dicts are hashed in their sorted JSON form.
+    if isinstance(value, str):
+        data = value.encode()
+    else:
+        data = json.dumps(value, sort_keys = True, default = str).encode()
+        
+    return hashlib.blake2b(data, digest_size = 16).hexdigest()
\ No newline at end of file
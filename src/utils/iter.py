@@ -0,0 +1,12 @@
+from itertools import islice
+
+def Batch(items, size: int = 100):
+    it = iter(items)
+    
+    while True:
+        batch = list(islice(it, size))
+        
+        if not batch:
+            return
+        
+        yield batch
\ No newline at end of file
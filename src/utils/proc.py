@@ -0,0 +1,72 @@
+import os
+import signal
+
+def processChildren() -> dict[int, list[int]]:
+    # Maps each PID to its child PIDs. Empty where /proc isn't available.
+    children: dict[int, list[int]] = {}
+    
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return children
+        
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+            
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+            
+        # The command name may contain spaces. Fields after it are fixed.
+        ppid = int(stat[stat.rfind(")") + 2:].split()[1])
+        
+        children.setdefault(ppid, []).append(int(entry))
+        
+    return children
+
+def ProcessTree(pid: int) -> list[int]:
+    # The process and all of its descendants, parents first.
+    children = processChildren()
+    
+    tree = []
+    pending = [pid]
+    
+    while len(pending) > 0:
+        cur = pending.pop(0)
+        
+        tree.append(cur)
+        pending.extend(children.get(cur, []))
+        
+    return tree
+
+def ProcessTreeRss(pid: int) -> int:
+    # Resident memory in bytes of a process and all of its descendants. Returns 0 where /proc isn't available.
+    pageSize = os.sysconf("SC_PAGE_SIZE")
+    
+    total = 0
+    
+    for cur in ProcessTree(pid):
+        try:
+            with open(f"/proc/{cur}/statm") as f:
+                total += int(f.read().split()[1]) * pageSize
+        except (OSError, IndexError, ValueError):
+            pass
+            
+    return total
+
+def KillProcessTree(pid: int) -> int:
+    # Kills the process and all of its descendants. Returns the amount of processes killed.
+    killed = 0
+    
+    for cur in ProcessTree(pid):
+        try:
+            os.kill(cur, signal.SIGKILL)
+            
+            killed += 1
+        except OSError:
+            pass
+            
+    return killed
\ No newline at end of file
@@ -1,4 +1,5 @@
 __title__ = "Web Scraper"
 __version__ = "1.0.0"
 
-from .base import Webscraper
\ No newline at end of file
+from .base import Webscraper
+from .sitemap import ReadSitemap, ParseLastmod
\ No newline at end of file
@@ -1,19 +1,42 @@
+import asyncio
 import json
+import os
 from datetime import datetime, timedelta
+from threading import local, Lock
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
-from utils import LimitText
+from utils import LimitText, Batch, Fingerprint
 from debugger import debugMsg
 
 import database
+from database import ClaimState
 from peewee import DoesNotExist
 
 from api import ModApi
+from banners import BannerStore
+
+from .pool import DriverPool
+from .scheduler import HostScheduler
+from .stages import StageExecutors
+from .blocking import BlockingPrefs, PacPrefs, THIRD_PARTY
+from .profiles import ProfileStore
 
 from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver import Firefox
 
 from selenium.webdriver.remote.command import Command
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException
+
+from bs4 import BeautifulSoup
+import lxml.html
+
+from requests import Session
+from requests.adapters import HTTPAdapter
 
 from random import choice
 
@@ -23,6 +46,11 @@ class Status(Enum):
     RUN = 1
     EXCEED_MAX_SPACE = 3
     DISABLED = 2
+    STOPPING = 4
+    
+class PageSource(str):
+    # The page source string with the parse tree built once by ParseMod() attached.
+    soup: BeautifulSoup = None
     
 class Webscraper():
     status: Status = Status.RUN
@@ -32,12 +60,50 @@ class Webscraper():
     tag: str = None
     protocol: str = "https"
     
-    driver: Firefox = None
+    baseDriver: Firefox = None
     autoRestartDriver: bool = True
     
+    pool: DriverPool = None
+    driverPoolSize: int = 1
+    
+    # Drivers are recycled after this many page loads or once their browser uses this many MBs. 0 disables.
+    driverRecyclePages: int = 500
+    driverRecycleRss: int = 1536
+    driverWarmSpare: bool = True
+    
+    # Time budgets in seconds for page loads, scripts and parsing a whole mod on a driver. 0 disables.
+    pageLoadTimeout: int = 30
+    scriptTimeout: int = 30
+    modTimeout: int = 180
+    
+    # Resource types the browser doesn't load (see blocking.py), hosts it never connects to and when to consider a page loaded.
+    blockResources: list[str] = []
+    blockHosts: list[str] = []
+    allowHosts: list[str] = []
+    pageLoadStrategy: str = "normal"
+    
+    # Persistent browser profiles so the HTTP cache and cookies survive driver restarts. Temporary profiles are used if no path is set.
+    profiles: ProfileStore = None
+    profilePath: str = None
+    profileCacheSize: int = 256
+    persistCookies: bool = False
+    
+    # Timed out or failed queries aren't claimed again for this many seconds, doubling on each failure in a row.
+    timeoutRetryDelay: int = 1800
+    timeoutRetryDelayMax: int = 86400
+    threadLocal: local = None
+    
+    session: Session = None
+    httpFirst: bool = False
+    httpTimeout: int = 10
+    
+    # Fields whose parse hooks need the page loaded in the web driver.
+    browserFields: list[str] = []
+    
     cfg: dict[str, any] = None
     
     api: ModApi = None
+    banners: BannerStore = None
     
     cats: dict[str, int] = {}
     catsChildren: dict[str, dict[str, int]] = {}
@@ -64,6 +130,48 @@ class Webscraper():
     cleanupBanners: bool = True
     
     limit: int = 1
+    findBatchSize: int = 500
+    
+    # Adaptive cycles resize parse and add batches between these limits.
+    adaptive: bool = False
+    busyIntervalMin: int = 5
+    idleIntervalMax: int = 3600
+    parseLimit: int = None
+    parseLimitMax: int = 10
+    addLimit: int = None
+    addLimitMax: int = 50
+    
+    # Parsed queries count towards the parse backlog again after this many seconds. 0 only counts never parsed and expired queries.
+    reparseAfter: int = 0
+    
+    # Parse and add cycles wait on notifications from the stage before them instead of only polling.
+    listen: bool = False
+    notifyDelay: float = 1.0
+    listener: database.Listener = None
+    
+    scheduler: HostScheduler = None
+    stages: StageExecutors = None
+    requestRate: float = 2.0
+    requestBurst: int = 4
+    requestConcurrency: int = 4
+    requestJitter: float = 0.25
+    
+    # Parsed fields mapped to UpdateOrAddMod() arguments.
+    apiFields: dict[str, str] = {
+        "viewUrl": "url",
+        "categoryId": "categoryId",
+        "banner": "banner",
+        "name": "name",
+        "ownerName": "ownerName",
+        "description": "description",
+        "descriptionShort": "descriptionShort",
+        "install": "install",
+        "nsfw": "nsfw",
+        "autoUpdate": "autoUpdate",
+        "downloads": "downloads",
+        "screenshots": "screenshots",
+        "installers": "installers"
+    }
     
     avoidIds: list[str] = []
     
@@ -96,12 +204,52 @@ class Webscraper():
         skipNullCategory: bool = None,
         logPageFailOutput: bool = None,
         cleanupBanners: bool = None,
-        avoidIds: list[str] = None
+        avoidIds: list[str] = None,
+        
+        driverPoolSize: int = None,
+        httpFirst: bool = None,
+        httpTimeout: int = None,
+        findBatchSize: int = None,
+        requestRate: float = None,
+        requestBurst: int = None,
+        requestConcurrency: int = None,
+        requestJitter: float = None,
+        adaptive: bool = None,
+        busyIntervalMin: int = None,
+        idleIntervalMax: int = None,
+        parseLimitMax: int = None,
+        addLimitMax: int = None,
+        listen: bool = None,
+        notifyDelay: float = None,
+        driverRecyclePages: int = None,
+        driverRecycleRss: int = None,
+        driverWarmSpare: bool = None,
+        pageLoadTimeout: int = None,
+        scriptTimeout: int = None,
+        modTimeout: int = None,
+        timeoutRetryDelay: int = None,
+        blockResources: list[str] = None,
+        blockHosts: list[str] = None,
+        allowHosts: list[str] = None,
+        pageLoadStrategy: str = None,
+        profilePath: str = None,
+        profileCacheSize: int = None,
+        persistCookies: bool = None,
+        reparseAfter: int = None
     ):
         super().__init__()
         
         self.cfg = cfg
         self.api = ModApi(self.cfg)
+        self.banners = BannerStore(self.cfg)
+        
+        self.threadLocal = local()
+        
+        # Serializes cookie restores into the shared HTTP session.
+        self.cookieLock = Lock()
+        
+        # Find, parse and add run their blocking work on separate threads, each with its own database connection.
+        self.stages = StageExecutors(self.stageContext)
         
         # Override URL, protocol, and categories for parser if necessary.
         if url is not None:
@@ -177,18 +325,124 @@ class Webscraper():
         # Avoid IDs
         if avoidIds is not None:
             self.avoidIds = avoidIds
-        
+            
+        # Driver pool size.
+        if driverPoolSize is not None:
+            self.driverPoolSize = max(1, driverPoolSize)
+            
+        # HTTP fetch tier.
+        if httpFirst is not None:
+            self.httpFirst = httpFirst
+            
+        if httpTimeout is not None:
+            self.httpTimeout = httpTimeout
+            
+        if findBatchSize is not None:
+            self.findBatchSize = findBatchSize
+            
+        # Per host politeness scheduler.
+        if requestRate is not None:
+            self.requestRate = requestRate
+            
+        if requestBurst is not None:
+            self.requestBurst = requestBurst
+            
+        if requestConcurrency is not None:
+            self.requestConcurrency = requestConcurrency
+            
+        if requestJitter is not None:
+            self.requestJitter = requestJitter
+            
+        # Adaptive cycles.
+        if adaptive is not None:
+            self.adaptive = adaptive
+            
+        if busyIntervalMin is not None:
+            self.busyIntervalMin = busyIntervalMin
+            
+        if idleIntervalMax is not None:
+            self.idleIntervalMax = idleIntervalMax
+            
+        if parseLimitMax is not None:
+            self.parseLimitMax = parseLimitMax
+            
+        if addLimitMax is not None:
+            self.addLimitMax = addLimitMax
+            
+        # Wake parse and add cycles through Postgres notifications.
+        if listen is not None:
+            self.listen = listen
+            
+        if notifyDelay is not None:
+            self.notifyDelay = notifyDelay
+            
+        # Driver recycling.
+        if driverRecyclePages is not None:
+            self.driverRecyclePages = driverRecyclePages
+            
+        if driverRecycleRss is not None:
+            self.driverRecycleRss = driverRecycleRss
+            
+        if driverWarmSpare is not None:
+            self.driverWarmSpare = driverWarmSpare
+            
+        # Timeouts.
+        if pageLoadTimeout is not None:
+            self.pageLoadTimeout = pageLoadTimeout
+            
+        if scriptTimeout is not None:
+            self.scriptTimeout = scriptTimeout
+            
+        if modTimeout is not None:
+            self.modTimeout = modTimeout
+            
+        if timeoutRetryDelay is not None:
+            self.timeoutRetryDelay = timeoutRetryDelay
+            
+        # Resource blocking.
+        if blockResources is not None:
+            self.blockResources = blockResources
+            
+        if blockHosts is not None:
+            self.blockHosts = blockHosts
+            
+        if allowHosts is not None:
+            self.allowHosts = allowHosts
+            
+        if pageLoadStrategy is not None:
+            self.pageLoadStrategy = pageLoadStrategy
+            
+        # Persistent browser profiles.
+        if profilePath is not None:
+            self.profilePath = profilePath
+            
+        if profileCacheSize is not None:
+            self.profileCacheSize = profileCacheSize
+            
+        if persistCookies is not None:
+            self.persistCookies = persistCookies
+            
+        if reparseAfter is not None:
+            self.reparseAfter = reparseAfter
+            
         # Compile tag.
         if self.tag is None:
             self.tag = f"{self.name}::{self.url}"
             
-        # Attempt to setup database.
-        try:
-            database.setup()
+        # Parsers may share a profile path. Each source gets its own directory.
+        if self.profilePath is not None:
+            self.profiles = ProfileStore(os.path.join(self.profilePath, self.url))
             
-            debugMsg(self.cfg, 1, f"[{self.tag}] Setup database tables.")
-        except:
-            pass
+        # Setup HTTP session for the HTTP fetch tier.
+        self.session = self.newSession()
+        
+        # Every page, sub page, image and sitemap request to a host is paced by the same scheduler.
+        self.scheduler = HostScheduler(self.cfg,
+            rate = self.requestRate,
+            burst = self.requestBurst,
+            concurrency = self.requestConcurrency,
+            jitter = self.requestJitter
+        )
         
         # Check if source exist. If not, insert into database.
         try:
@@ -205,13 +459,107 @@ class Webscraper():
                 debugMsg(self.cfg, 0, f"[{self.tag} MF] Error inserting source into database!")
                 debugMsg(self.cfg, 0, e)
                 
+    @property
+    def driver(self) -> Firefox:
+        # Pool workers see the driver they checked out. Other threads borrow one of their own on first use so they never share a browser with a worker.
+        driver = getattr(self.threadLocal, "driver", None)
+        
+        if driver is not None:
+            return driver
+        
+        if self.pool is None:
+            return self.baseDriver
+        
+        self.threadLocal.driver = self.pool.Borrow()
+        self.threadLocal.borrowed = True
+        
+        return self.threadLocal.driver
+    
+    @driver.setter
+    def driver(self, driver: Firefox):
+        self.baseDriver = driver
+    
+    def releaseDriver(self):
+        # Returns a driver borrowed through the driver property.
+        if not getattr(self.threadLocal, "borrowed", False):
+            return
+        
+        driver = self.threadLocal.driver
+        
+        self.threadLocal.borrowed = False
+        self.threadLocal.driver = None
+        
+        self.pool.Return(driver)
+        
+    @contextmanager
+    def stageContext(self):
+        # Each stage call gets its own database connection and returns any driver it borrowed.
+        try:
+            with database.context():
+                yield
+        finally:
+            self.releaseDriver()
+            
+    def Close(self):
+        # Quit every web driver, falling back to the base driver if the pool was never set up.
+        if self.pool is not None:
+            self.pool.Close()
+        elif self.baseDriver is not None:
+            self.quitDriver(self.baseDriver)
+            
+        self.baseDriver = None
+        
     def setupDriver(self):
+        self.driver = self.newDriver()
+        
+        # Setup driver pool using our base driver as the first member.
+        self.pool = DriverPool(self, self.driverPoolSize,
+            recyclePages = self.driverRecyclePages,
+            recycleRss = self.driverRecycleRss,
+            warmSpare = self.driverWarmSpare,
+            checkoutTimeout = self.modTimeout
+        )
+        self.pool.Setup(self.baseDriver)
+        
+    def newDriver(self) -> Firefox:
         # Setup options.
         opts = Options()
         
         opts.add_argument("--headless")
         opts.add_argument("--no-sandbox")
         
+        opts.page_load_strategy = self.pageLoadStrategy
+        
+        # Skip downloading what our parsers never look at.
+        prefs = BlockingPrefs(self.blockResources)
+        
+        # Blocking third party requests only lets the source and allowed hosts through.
+        allowHosts = None
+        
+        if THIRD_PARTY in self.blockResources:
+            allowHosts = [self.url] + self.allowHosts
+            
+        prefs.update(PacPrefs(self.blockHosts, allowHosts))
+        
+        # Reuse a profile directory so cached scripts, styles and cookies outlive the browser.
+        slot = None
+        
+        if self.profiles is not None:
+            slot = self.profiles.Acquire()
+            
+            opts.add_argument("-profile")
+            opts.add_argument(slot)
+            
+            prefs.update({
+                "browser.cache.disk.enable": True,
+                "browser.cache.disk.smart_size.enabled": False,
+                "browser.cache.disk.capacity": self.profileCacheSize * 1024,
+                "browser.cache.disk.parent_directory": os.path.join(slot, "cache")
+            })
+        
+        for name, value in prefs.items():
+            opts.set_preference(name, value)
+        
         # Pick random user agent if any.
         if len(self.cfg["userAgents"]) > 0:
             # Get random user agent.
@@ -221,15 +569,109 @@ class Webscraper():
         
         service = Service(executable_path=self.cfg["binaryPath"])
         
-        self.driver = Firefox(options = opts, service = service)
+        try:
+            driver = Firefox(options = opts, service = service)
+        except Exception:
+            if slot is not None:
+                self.profiles.Free(slot)
+                
+            raise
+            
+        if slot is not None:
+            self.profiles.Bind(driver, slot)
+            
+        if self.pageLoadTimeout > 0:
+            driver.set_page_load_timeout(self.pageLoadTimeout)
+            
+        if self.scriptTimeout > 0:
+            driver.set_script_timeout(self.scriptTimeout)
+            
+        if self.persistCookies and self.profiles is not None:
+            self.loadCookies(driver)
+            
+        return driver
+        
+    def quitDriver(self, driver: Firefox):
+        # Keep the session cookies around for the next browser. A dead browser has none to give.
+        if self.persistCookies and self.profiles is not None and self.checkDriver(driver):
+            try:
+                self.profiles.SaveCookies(driver, driver.get_cookies())
+            except Exception as e:
+                debugMsg(self.cfg, 1, f"[{self.tag}] Failed to save web driver cookies.")
+                debugMsg(self.cfg, 1, e)
+                
+        try:
+            driver.quit()
+        except Exception:
+            pass
+            
+        if self.profiles is not None:
+            self.profiles.Release(driver)
+            
+    def loadCookies(self, driver: Firefox):
+        cookies = self.profiles.LoadCookies()
+        
+        if len(cookies) < 1:
+            return
+        
+        try:
+            # Cookies can only be set for the page the browser is on.
+            url = f"{self.protocol}://{self.url}/robots.txt"
+            
+            with self.scheduler.Slot(url):
+                driver.get(url)
+                
+            restored = []
+            
+            for cookie in cookies:
+                try:
+                    driver.add_cookie(cookie)
+                except Exception:
+                    continue
+                    
+                restored.append(cookie)
+                
+            # The HTTP fetch tier shares the browser's cookies. Worker threads use the session while this runs on the launcher thread, so swap in an updated copy instead of changing the jar in place.
+            with self.cookieLock:
+                jar = self.session.cookies.copy()
+                
+                for cookie in restored:
+                    jar.set(cookie["name"], cookie["value"], domain = cookie.get("domain"), path = cookie.get("path", "/"))
+                    
+                self.session.cookies = jar
+                
+            debugMsg(self.cfg, 3, f"[{self.tag}] Restored {len(restored)} of {len(cookies)} cookies into web driver.")
+        except Exception as e:
+            debugMsg(self.cfg, 1, f"[{self.tag}] Failed to restore web driver cookies.")
+            debugMsg(self.cfg, 1, e)
+        
+    def newSession(self) -> Session:
+        session = Session()
+        
+        # Keep one connection per pooled driver alive to the source.
+        adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = self.driverPoolSize)
         
-    def checkDriver(self) -> bool:
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        
+        if len(self.cfg["userAgents"]) > 0:
+            session.headers["User-Agent"] = choice(self.cfg["userAgents"])
+            
+        return session
+        
+    def checkDriver(self, driver: Firefox = None) -> bool:
+        if driver is None:
+            driver = self.driver
+            
         try:
-            self.driver.title
+            driver.title
             return True
         except Exception as e:
             return False
                 
+    def claimLease(self) -> timedelta:
+        return timedelta(seconds = int(self.cfg["database"]["claimLease"]))
+    
     def shouldRun(self) -> bool:
         return self.status == Status.RUN
                 
@@ -256,8 +698,112 @@ class Webscraper():
                 
     def BaseWait(self):
         pass
+    
+    def HttpWait(self, url: str, resp: str) -> bool:
+        # The HTTP equivalent of BaseWait(). Return true if the server-rendered page has everything we need.
+        return False
+    
+    def NeedsBrowser(self, url: str, field: str, resp: str) -> bool:
+        # Whether a field in browserFields really needs the browser for this page.
+        return True
+    
+    def HasXpath(self, resp: str, xpath: str) -> bool:
+        try:
+            return len(lxml.html.fromstring(resp).xpath(xpath)) > 0
+        except Exception:
+            return False
+        
+    def HttpGet(self, url: str, **kwargs):
+        return self.scheduler.Get(self.session, url, timeout = self.httpTimeout, **kwargs)
+    
+    def DriverGet(self, url: str):
+        with self.scheduler.Slot(url):
+            try:
+                self.driver.get(url)
+            except TimeoutException:
+                self.threadLocal.timedOut = True
                 
-    async def GatherQueries(self) -> list[str]:
+                raise
+            
+        if self.pool is not None:
+            self.pool.CountPage(self.driver)
+            
+    def FetchPage(self, url: str) -> PageSource:
+        # Attempt to retrieve the page over plain HTTP. Returns None if the page needs the browser.
+        try:
+            resp = self.HttpGet(url)
+        except Exception as e:
+            debugMsg(self.cfg, 3, f"[{self.tag} P] HTTP request to '{url}' failed. Falling back to web driver.")
+            debugMsg(self.cfg, 3, e)
+            
+            return None
+        
+        if resp.status_code != 200:
+            debugMsg(self.cfg, 3, f"[{self.tag} P] HTTP request to '{url}' returned status code {resp.status_code}. Falling back to web driver.")
+            
+            return None
+        
+        page = self.BuildPage(resp.text)
+        
+        if not self.HttpWait(url, page):
+            debugMsg(self.cfg, 4, f"[{self.tag} P] Page '{url}' isn't ready without JavaScript. Falling back to web driver.")
+            
+            return None
+        
+        return page
+    
+    def FetchSubPage(self, url: str, waitXpath: str, timeout: int = 2) -> PageSource:
+        # Try plain HTTP first and check the same XPath the browser would wait for.
+        if self.httpFirst:
+            try:
+                resp = self.HttpGet(url)
+                
+                if resp.status_code == 200 and self.HasXpath(resp.text, waitXpath):
+                    return self.BuildPage(resp.text)
+            except Exception as e:
+                debugMsg(self.cfg, 3, f"[{self.tag} P] HTTP request to sub page '{url}' failed. Falling back to web driver.")
+                debugMsg(self.cfg, 3, e)
+                
+        self.DriverGet(url)
+        
+        self.threadLocal.browserLoaded = True
+        
+        WebDriverWait(self.driver, timeout).until(
+            EC.presence_of_element_located((By.XPATH, waitXpath))
+        )
+        
+        return self.BuildPage(self.driver.page_source)
+    
+    def LoadBrowser(self, url: str) -> bool:
+        debugMsg(self.cfg, 4, f"[{self.tag} P] Loading '{url}' in web driver for browser only fields.")
+        
+        try:
+            self.DriverGet(url)
+            
+            self.threadLocal.browserLoaded = True
+            
+            self.BaseWait()
+        except Exception as e:
+            debugMsg(self.cfg, 2, f"[{self.tag} P] Failed to load '{url}' in web driver for browser only fields.")
+            debugMsg(self.cfg, 2, e)
+            
+            return False
+        
+        return True
+    
+    def ParseField(self, field: str, hook, url: str, resp: str):
+        # Pages retrieved over HTTP only get loaded in the browser when a browser field really needs it.
+        if field in self.browserFields and not getattr(self.threadLocal, "browserLoaded", True):
+            if not self.NeedsBrowser(url, field, resp):
+                return None, False
+            
+            if not self.LoadBrowser(url):
+                return None, False
+            
+        return hook(url, resp)
+                
+    async def GatherQueries(self):
+        # Return an iterable of queries or (query, lastmod) pairs. Generators are consumed in batches.
         queries = []
         
         debugMsg(self.cfg, 2, f"[{self.tag} F] Gathering mods.")
@@ -265,6 +811,9 @@ class Webscraper():
         return queries
     
     async def FindMods(self):
+        return await self.stages.Run("find", self.runFindMods)
+        
+    def runFindMods(self) -> int:
         # Check disk space.
         self.checkQuerySize()
         
@@ -272,38 +821,91 @@ class Webscraper():
         if not self.shouldRun():
             debugMsg(self.cfg, 5, f"[{self.tag} F] Aborting due to scraper status ({self.status}).")
             
-            return
+            return 0
         
         # Check if finding is enabled.
         if not self.findEnabled:
             debugMsg(self.cfg, 5, f"[{self.tag} F] Finding disabled. Aborting...")
             
-            return
+            return 0
         
-        # Retrieve queries.
-        queries = await self.GatherQueries()
+        # Retrieve queries. We're on the find stage's thread so the hook gets its own event loop.
+        queries = asyncio.run(self.GatherQueries())
         
-        debugMsg(self.cfg, 3, f"[{self.tag} F] Found {len(queries)} queries to add to queue.")
+        total = 0
+        added = 0
         
-        for query in queries:
-            debugMsg(self.cfg, 3, f"[{self.tag} F] Found query '{query}'.")
+        try:
+            for batch in Batch(queries, self.findBatchSize):
+                total += len(batch)
+                
+                added += self.AddQueries(batch)
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} F] Error gathering queries.")
+            debugMsg(self.cfg, 0, e)
+            
+        debugMsg(self.cfg, 3, f"[{self.tag} F] Found {total} queries to add to queue.")
+        
+        return added
+        
+    def AddQueries(self, batch: list) -> int:
+        # Returns the amount of new queries added.
+        added = 0
+        
+        queries: list[str] = []
+        lastmods: dict[str, datetime] = {}
+        
+        for query in batch:
+            # Queries may come with the time they were last modified at the source.
+            if isinstance(query, tuple):
+                query, lastmod = query
+                
+                if lastmod is not None:
+                    lastmods[query] = lastmod
+            
+            debugMsg(self.cfg, 4, f"[{self.tag} F] Found query '{query}'.")
+            
+            queries.append(query)
+            
+        # Insert new queries in bulk. Existing queries are left untouched.
+        try:
+            added = database.AddQueriesBulk(self.url, queries)
             
+            debugMsg(self.cfg, 2, f"[{self.tag} F] Added {added} new queries to database out of {len(queries)} found.")
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} F] Failed to add {len(queries)} queries.")
+            debugMsg(self.cfg, 0, e)
+            
+        # Queue queries that changed at the source since we last parsed them.
+        if len(lastmods) > 0:
             try:
-                # Attempt to find query.
-                try:
-                    database.GetQuery(self.url, query)
-                except DoesNotExist:
-                    debugMsg(self.cfg, 3, f"[{self.tag} F] Query '{query}' doesn't exist. Attempting to add.")
-                    
-                    # Add query to database.
-                    query = database.AddQuery(self.url, query)
-                    
-                    debugMsg(self.cfg, 2, f"[{self.tag} F] Added query '{query}' to database!")                        
+                expired = database.ExpireQueries(self.url, lastmods)
+                
+                debugMsg(self.cfg, 3, f"[{self.tag} F] Marked {expired} queries modified at the source for parsing.")
             except Exception as e:
-                debugMsg(self.cfg, 0, f"[{self.tag} F] Failed to add query '{query}'.")
+                debugMsg(self.cfg, 0, f"[{self.tag} F] Failed to mark modified queries for parsing.")
                 debugMsg(self.cfg, 0, e)
+                
+        if added > 0 or len(lastmods) > 0:
+            self.notify(database.PARSE_CHANNEL)
+                
+        return added
+        
+    def notify(self, channel: str):
+        # Wake the stage waiting on this channel. Failures only delay it until its next poll.
+        if not self.listen:
+            return
+        
+        try:
+            database.Notify(channel, self.url)
+        except Exception as e:
+            debugMsg(self.cfg, 1, f"[{self.tag}] Failed to notify channel '{channel}'.")
+            debugMsg(self.cfg, 1, e)
 
     async def ParseMods(self):
+        return await self.stages.Run("parse", self.runParseMods)
+        
+    def runParseMods(self) -> int:
         # Check disk space.
         self.checkQuerySize()
         
@@ -311,19 +913,48 @@ class Webscraper():
         if not self.shouldRun():
             debugMsg(self.cfg, 5, f"[{self.tag} P] Aborting due to scraper status ({self.status}).")
             
-            return
+            return 0
         
         # Check if parsing is enabled.
         if not self.parseEnabled:
             debugMsg(self.cfg, 5, f"[{self.tag} P] Parsing disabled. Aborting...")
             
-            return
+            return 0
         
         debugMsg(self.cfg, 2, f"[{self.tag} P] Parsing Mods!")
         
-        # Check if we should only search for existing entries.
+        filters = self.parseFilters()
+        exists = filters["exists"]
+        
+        mods = []
+        
+        try:            
+            # Claim mods so no other worker parses them at the same time.
+            mods = database.ClaimQueries(ClaimState.PARSE, self.claimLease(),
+                limit = max(self.parseLimit or self.limit, self.driverPoolSize),
+                **filters
+            )
+            
+            debugMsg(self.cfg, 3, f"[{self.tag} P] Found {len(mods)} mods to parse.")
+            debugMsg(self.cfg, 4, f"[{self.tag} P] Mods => {mods}")
+            
+            try:
+                # Parse each mod on a driver checked out from the pool.
+                with ThreadPoolExecutor(max_workers = self.driverPoolSize) as executor:
+                    list(executor.map(lambda mod: self.ParsePooledQuery(mod, exists), mods))
+            finally:
+                database.ReleaseQueries(self.url, [mod.query for mod in mods])
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} P] Error retrieving and parsing mods from database.")
+            debugMsg(self.cfg, 0, e)
+            
+        return len(mods)
+        
+    def parseFilters(self) -> dict[str, any]:
+        # Query filters the parse stage claims with.
         exists = None
         
+        # Check if we should only search for existing entries.
         if self.parseNew and not self.parseExisting:
             exists = False
         elif not self.parseNew and self.parseExisting:
@@ -334,57 +965,130 @@ class Webscraper():
         
         if exists:
             catIds = self.getCategoryIds()
-        
-        try:            
-            mods = database.GetQueries(
-                limit = self.limit,
-                url = self.url,
-                allow = True,
-                random = True,
-                exists = exists,
-                cats = catIds
-            )
             
-            debugMsg(self.cfg, 3, f"[{self.tag} P] Found {len(mods)} mods to parse.")
-            debugMsg(self.cfg, 4, f"[{self.tag} P] Mods => {mods}")
+        return {
+            "url": self.url,
+            "allow": True,
+            "exists": exists,
+            "cats": catIds,
+            "retryReady": True
+        }
+        
+    def ParseBacklog(self, cap: int = None) -> int:
+        # Queries the parse stage would claim that were never parsed, expired by their source or are older than reparseAfter.
+        filters = self.parseFilters()
+        
+        try:
+            backlog = database.CountQueries(cap, lastParsedNull = True, **filters)
             
-            for mod in mods:
-                url = f"{self.protocol}://{self.url}{mod.query}"
+            if self.reparseAfter > 0 and (cap is None or backlog < cap):
+                backlog += database.CountQueries(None if cap is None else cap - backlog,
+                    preTime = timedelta(seconds = self.reparseAfter),
+                    **filters
+                )
                 
-                debugMsg(self.cfg, 3, f"[{self.tag} P] Sending request to URL '{url}' for parsing.")
+            return backlog
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} P] Error counting parse backlog.")
+            debugMsg(self.cfg, 0, e)
+            
+        return 0
+        
+    def ParsePooledQuery(self, mod, exists: bool = None):
+        # Skip mods not started yet when stopping. Their claims are released with the rest.
+        if self.status == Status.STOPPING:
+            return
+        
+        try:
+            # Worker threads return their pooled database connection once done.
+            with database.context(), self.pool.Checkout() as driver:
+                self.threadLocal.driver = driver
+                self.threadLocal.timedOut = False
+                self.threadLocal.stamped = False
                 
                 try:
-                    self.driver.get(url)
-                    
-                    # Wait if we need to based off of web scraper.
-                    try:
-                        self.BaseWait()
-                    except Exception as e:
-                        debugMsg(self.cfg, 0, f"[{self.tag} P] Failed to parse query '{mod.query}' due to base wait exception.")
-                        debugMsg(self.cfg, 0, e)
-                        
-                        # Log page output if enabled.
-                        if self.logPageFailOutput:
-                            self.LogPageFail()
-                            
-                        # If exists is on, we should update the last parsed time to avoid getting stuck.
-                        if exists:
-                            now = datetime.now()
-                            
-                            mod.lastParsed = now
-                            mod.save()
-                            
-                        continue
+                    self.ParseQuery(mod, exists)
+                finally:
+                    self.threadLocal.driver = None
                     
-                    self.ParseMod(url, mod.query, self.driver.page_source)
-                except Exception as e:
-                    debugMsg(self.cfg, 2, f"[{self.tag} P] Error parsing query with full URL '{url}' due to exception.")
-                    debugMsg(self.cfg, 2, e)
+                # The page load timed out or the watchdog killed the driver.
+                if self.threadLocal.timedOut or self.pool.Expired(driver):
+                    self.RecordTimeout(mod)
+                elif not self.threadLocal.stamped:
+                    # Nothing moved the query back in the queue. Without this it would be claimed first again next cycle.
+                    self.RecordFailure(mod)
         except Exception as e:
-            debugMsg(self.cfg, 0, f"[{self.tag} P] Error retrieving and parsing mods from database.")
+            debugMsg(self.cfg, 0, f"[{self.tag} P] Error parsing query '{mod.query}' on pooled driver.")
+            debugMsg(self.cfg, 0, e)
+            
+    def RecordFailure(self, mod):
+        try:
+            query = database.FailQuery(self.url, mod.query, self.timeoutRetryDelay, self.timeoutRetryDelayMax)
+            
+            debugMsg(self.cfg, 2, f"[{self.tag} P] Query '{mod.query}' failed to parse ({query.timeouts} in a row). Retrying after {query.retryAfter}.")
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} P] Failed to record failed parse for query '{mod.query}'.")
+            debugMsg(self.cfg, 0, e)
+            
+    def RecordTimeout(self, mod):
+        try:
+            query = database.TimeoutQuery(self.url, mod.query, self.timeoutRetryDelay, self.timeoutRetryDelayMax)
+            
+            debugMsg(self.cfg, 1, f"[{self.tag} P] Query '{mod.query}' timed out ({query.timeouts} in a row). Retrying after {query.retryAfter}.")
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} P] Failed to record timeout for query '{mod.query}'.")
             debugMsg(self.cfg, 0, e)
+            
+    def ParseQuery(self, mod, exists: bool = None):
+        url = f"{self.protocol}://{self.url}{mod.query}"
+        
+        debugMsg(self.cfg, 3, f"[{self.tag} P] Sending request to URL '{url}' for parsing.")
+        
+        try:
+            # Try the HTTP tier first.
+            if self.httpFirst:
+                page = self.FetchPage(url)
+                
+                if page is not None:
+                    debugMsg(self.cfg, 4, f"[{self.tag} P] Retrieved '{url}' over HTTP.")
+                    
+                    self.ParseMod(url, mod.query, page, browser = False)
+                    
+                    return
+            
+            self.DriverGet(url)
+            
+            # Wait if we need to based off of web scraper.
+            try:
+                self.BaseWait()
+            except Exception as e:
+                debugMsg(self.cfg, 0, f"[{self.tag} P] Failed to parse query '{mod.query}' due to base wait exception.")
+                debugMsg(self.cfg, 0, e)
+                
+                # Log page output if enabled.
+                if self.logPageFailOutput:
+                    self.LogPageFail()
+                    
+                # If exists is on, we should update the last parsed time to avoid getting stuck.
+                if exists:
+                    now = datetime.now()
+                    
+                    mod.lastParsed = now
+                    mod.save()
+                    
+                    self.threadLocal.stamped = True
+                    
+                return
+            
+            self.ParseMod(url, mod.query, self.driver.page_source)
+        except Exception as e:
+            debugMsg(self.cfg, 2, f"[{self.tag} P] Error parsing query with full URL '{url}' due to exception.")
+            debugMsg(self.cfg, 2, e)
         
     async def AddMods(self):
+        return await self.stages.Run("add", self.runAddMods)
+        
+    def runAddMods(self) -> int:
         # Check disk space.
         self.checkQuerySize()
         
@@ -392,18 +1096,20 @@ class Webscraper():
         if not self.shouldRun():
             debugMsg(self.cfg, 5, f"[{self.tag} A] Aborting due to scraper status ({self.status}).")
             
-            return
+            return 0
         
         # Check if adding is enabled.
         if not self.addEnabled:
             debugMsg(self.cfg, 5, f"[{self.tag} A] Adding disabled. Aborting...")
             
-            return
+            return 0
         
         debugMsg(self.cfg, 2, f"[{self.tag} A] Attempting to add mods...")
         
         apiInfo = self.cfg["api"]
         
+        queries = []
+        
         try:            
             # Check if we should only search for existing entries.
             exists = None
@@ -413,13 +1119,12 @@ class Webscraper():
             elif not self.addNew and self.addExisting:
                 exists = True
             
-            queries = database.GetQueries(
+            # Claim queries so no other worker adds them at the same time.
+            queries = database.ClaimQueries(ClaimState.ADD, self.claimLease(),
                 url = self.url,
-                limit = apiInfo["limit"],
+                limit = max(self.addLimit or apiInfo["limit"], apiInfo["inFlight"]),
                 needsUpdating = True,
                 allow = True,
-                orderByLastParsed = False,
-                random = True,
                 nameNotNull = True,
                 descNotNull = True,
                 viewUrlNotNull = True,
@@ -428,258 +1133,476 @@ class Webscraper():
             
             debugMsg(self.cfg, 3, f"[{self.tag} A] Found {len(queries)} queries to add through API.")
             
+            try:
+                self.AddQueriesApi(queries)
+            finally:
+                database.ReleaseQueries(self.url, [query.query for query in queries])
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} A] Error retrieving queries to add via API.")
+            debugMsg(self.cfg, 0, e)
+            
+        return len(queries)
+            
+    def AddBacklog(self, cap: int = None) -> int:
+        # The amount of queries waiting to be added or updated via API.
+        try:
+            return database.CountQueries(cap,
+                url = self.url,
+                needsUpdating = True,
+                allow = True,
+                nameNotNull = True,
+                descNotNull = True,
+                viewUrlNotNull = True
+            )
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} A] Error counting add backlog.")
+            debugMsg(self.cfg, 0, e)
+            
+        return 0
+        
+    def AddQueriesApi(self, queries: list):
+        apiInfo = self.cfg["api"]
+        
+        # Load mod contents for the whole batch at once.
+        payloads = database.GetQueryPayloads(self.url, [query.query for query in queries])
+        
+        # Use the API's batch endpoints unless the server told us it doesn't have them.
+        if apiInfo["batch"] and self.api.batchSupported is not False:
+            self.AddQueriesBatchApi(queries, payloads)
+            
+            return
+        
+        inFlight = max(1, int(apiInfo["inFlight"]))
+        
+        if inFlight < 2:
             for query in queries:
-                debugMsg(self.cfg, 4, f"[{self.tag} A] Retrieved query => '{query.query}'.")
+                self.AddQueryApi(query, payloads.get(query.query))
                 
-                resp = self.api.GetMod(None, self.url, query.query)
+            return
+        
+        # Submit up to inFlight queries at once. Each worker writes its own query's results back.
+        with ThreadPoolExecutor(max_workers = inFlight) as executor:
+            list(executor.map(lambda query: self.AddPooledQueryApi(query, payloads.get(query.query)), queries))
+            
+    def AddQueriesBatchApi(self, queries: list, payloads: dict):
+        # Look up every query missing from the mod cache in one request.
+        cached = database.GetCachedMods(self.url, [query.query for query in queries], self.cfg["api"]["cacheTtl"])
+        
+        missing = [query.query for query in queries if query.query not in cached]
+        
+        lookups = {}
+        
+        if len(missing) > 0:
+            lookups = dict(zip(missing, self.api.GetMods([(self.url, query) for query in missing])))
+            
+        mods = []
+        
+        for query in queries:
+            payload = payloads.get(query.query)
+            
+            try:
+                prepared = self.PrepareQueryApi(query, payload, lookups.get(query.query))
+            except Exception as e:
+                debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' failed to insert/update.")
+                debugMsg(self.cfg, 0, e)
                 
-                errGeneral = f"Failed to retrieve query => '{query.query}' from API"
+                continue
+            
+            if prepared is not None:
+                mods.append((query, payload, *prepared))
                 
-                if resp is None:
-                    debugMsg(self.cfg, 0, f"[{self.tag} A] {errGeneral}. Response is none.")
-                    
-                    continue
+        if len(mods) < 1:
+            return
+        
+        # Then add or update all of them in one request.
+        results = self.api.UpdateOrAddMods([mod for _, _, _, mod in mods])
+        
+        for (query, payload, found, mod), resp in zip(mods, results):
+            self.FinishQueryApi(query, payload, found, mod, resp)
+            
+    def AddPooledQueryApi(self, query, payload):
+        try:
+            # Worker threads return their pooled database connection once done.
+            with database.context():
+                self.AddQueryApi(query, payload)
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} A] Error adding query '{query.query}' through API.")
+            debugMsg(self.cfg, 0, e)
+            
+    def PrepareQueryApi(self, query, payload, lookupResp = None) -> tuple[bool, dict[str, any]]:
+        # Returns whether the mod already exists along with UpdateOrAddMod()'s arguments. None if the query is skipped.
+        debugMsg(self.cfg, 4, f"[{self.tag} A] Retrieved query => '{query.query}'.")
+        
+        if payload is None:
+            debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' has no contents stored. Skipping...")
+            
+            return None
+        
+        lookup = self.LookupMod(query, lookupResp)
+        
+        if lookup is None:
+            return None
+        
+        found, id, remoteAutoUpdate = lookup
+        
+        if found:
+            if not remoteAutoUpdate:
+                debugMsg(self.cfg, 4, f"[{self.tag} A] Skipping query '{query.query}' due to auto updating being disabled. ID => '{id}'.")
                 
-                if resp.status_code != 200:
-                    debugMsg(self.cfg, 0, f"[{self.tag} A] {errGeneral}. Status code => {resp.status_code}.")
+                # Set needs updating to false and save.
+                try:
+                    query.needsUpdating = False
                     
-                    continue
+                    query.save()
+                except Exception as e:
+                    debugMsg(self.cfg, 0, f"[{self.tag} A] Failed to set existing query '{query.query}' to needsUpdating = False due to exception.")
+                    debugMsg(self.cfg, 0, e)
                 
+                return None
+                
+            # If add existing is off, skip this query.
+            if not self.addExisting:
+                debugMsg(self.cfg, 4, f"[{self.tag} A] Skipping query '{query.query}' due to already existing and update existing set to False. ID => '{id}'.")
+                
+                # Set mod ID to ensure we don't pick it again and save.
                 try:
-                    jsonObj = json.loads(resp.text)
+                    query.modId = id
+                    
+                    query.save()
                 except Exception as e:
-                    debugMsg(self.cfg, 0, f"[{self.tag} A] {errGeneral}. Failed to load JSON due to following exception.")
+                    debugMsg(self.cfg, 0, f"[{self.tag} A] Failed to set existing query '{query.query}' mod ID due to exception.")
                     debugMsg(self.cfg, 0, e)
-                    
-                    continue
                 
-                debugMsg(self.cfg, 3, f"[{self.tag} A] Found JSON response for query => '{query.query}'. Response => '{jsonObj}'.")
+                return None
+        else:
+            # Check if add new is enabled.
+            if not self.addNew:
+                debugMsg(self.cfg, 4, f"[{self.tag} A] Skipping query '{query.query}' due to being new.")
                 
-                if "data" not in jsonObj:
-                    debugMsg(self.cfg, 0, f"[{self.tag} A] {errGeneral}. No 'data' object found in JSON response.")
+                # Make sure mod ID is null.
+                try:
+                    query.modId = None
                     
-                    continue
-                
-                data = jsonObj["data"]
+                    query.save()
+                except Exception as e:
+                    debugMsg(self.cfg, 0, f"[{self.tag} A] Failed to set new query '{query.query}' to mod ID = NULL. Didn't find match and addNew is set to false.")
+                    debugMsg(self.cfg, 0, e)
                 
-                # Retrieve mod ID.
-                id = None
+                return None
+        
+        debugMsg(self.cfg, 3, f"[{self.tag} A] Preparing to add or update mod with ID '{id}'.")
+        
+        # We need to build our sources manually.
+        sources = [{
+            "sourceUrl": str(query.url),
+            "query": query.query
+        }]
+        
+        # Relations are stored as JSONB and come back as lists already. Empty lists are kept so clearing a relation reaches the API.
+        downloads: list[dict[str, str]] = payload.downloads
+        screenshots: list[dict[str, str]] = payload.screenshots
+        installers: list[dict[str, str]] = payload.installers
+            
+        # Extract query data into their own variables.
+        viewUrl = query.viewUrl
+        banner = payload.banner
+        
+        categoryId = query.categoryId
+        
+        # Check category ID if skip null category is set to true.
+        if self.skipNullCategory and (categoryId is None or categoryId < 1):
+            debugMsg(self.cfg, 2, f"[{self.tag} A] Query '{query.query}' doesn't have a valid category ID. Skipping...")
+            
+            return None
+        
+        name = query.name
+        ownerName = query.ownerName
+        description = payload.description
+        descriptionShort = query.descriptionShort
+        install = payload.install
+        
+        nsfw = query.nsfw
+        autoUpdate = query.autoUpdate
+            
+        debugMsg(self.cfg, 4, f"[{self.tag} A] Adding or updating mod with query '{query.query}'. ID => '{id}'. View URL => '{viewUrl}'. Category ID => '{categoryId}'. Banner => '{LimitText(banner)}'. Name => '{name}'. Owner Name => '{ownerName}'. Description => '{LimitText(description)}'. Description short => '{descriptionShort}'. Install => '{LimitText(install)}'. NSFW => '{nsfw}'. Auto Update => '{autoUpdate}'. Sources => '{sources}'. Downloads => '{downloads}'. Screenshots => '{screenshots}'. Installers => '{installers}'.")
+        
+        # Existing mods only need the fields changed since they were last submitted. Payloads from before fingerprinting are sent in full.
+        fields = None
+        
+        if found and id is not None and payload.changedFields is not None:
+            fields = [self.apiFields[field] for field in payload.changedFields if field in self.apiFields]
+            
+            if len(fields) < 1:
+                debugMsg(self.cfg, 4, f"[{self.tag} A] Query '{query.query}' has no changed fields. Skipping...")
                 
-                if data and len(data) > 0:
-                    obj = data[0]
-                    
-                    # Retrieve ID.
-                    if "id" in obj:
-                        id = int(obj["id"])
-                        
-                    # Retrieve and check for auto update.
-                    autoUpdate = False
-                    
-                    if "autoUpdate" in obj:
-                        autoUpdate = bool(obj["autoUpdate"])
-                        
-                    if not autoUpdate:
-                        debugMsg(self.cfg, 4, f"[{self.tag} A] Skipping query '{query.query}' due to auto updating being disabled. ID => '{id}'.")
-                        
-                        # Set needs updating to false and save.
-                        try:
-                            query.needsUpdating = False
-                            
-                            query.save()
-                        except Exception as e:
-                            debugMsg(self.cfg, 0, f"[{self.tag} A] Failed to set existing query '{query.query}' to needsUpdating = False due to exception.")
-                            debugMsg(self.cfg, 0, e)
-                        
-                        continue
-                        
-                    # If add existing is off, skip this query.
-                    if not self.addExisting:
-                        debugMsg(self.cfg, 4, f"[{self.tag} A] Skipping query '{query.query}' due to already existing and update existing set to False. ID => '{id}'.")
-                        
-                        # Set mod ID to ensure we don't pick it again and save.
-                        try:
-                            query.modId = id
-                            
-                            query.save()
-                        except Exception as e:
-                            debugMsg(self.cfg, 0, f"[{self.tag} A] Failed to set existing query '{query.query}' mod ID due to exception.")
-                            debugMsg(self.cfg, 0, e)
-                        
-                        continue
-                else:
-                    # Check if add new is enabled.
-                    if not self.addNew:
-                        debugMsg(self.cfg, 4, f"[{self.tag} A] Skipping query '{query.query}' due to being new.")
-                        
-                        # Make sure mod ID is null.
-                        try:
-                            query.modId = None
-                            
-                            query.save()
-                        except Exception as e:
-                            debugMsg(self.cfg, 0, f"[{self.tag} A] Failed to set new query '{query.query}' to mod ID = NULL. Didn't find match and addNew is set to false.")
-                            debugMsg(self.cfg, 0, e)
-                        
-                        continue
-                
-                debugMsg(self.cfg, 3, f"[{self.tag} A] Preparing to add or update mod with ID '{id}'.")
-                
-                # Attempt to update mod through our API.
                 try:
-                    # We need to build our sources manually.
-                    sources = [{
-                        "sourceUrl": str(query.url),
-                        "query": query.query
-                    }]
-                    
-                    # We need to convert our relations to JSON objects.
-                    downloads: list[dict[str, str]] = None
-                    screenshots: list[dict[str, str]] = None
-                    installers: list[dict[str, str]] = None
-                    
-                    if query.downloads is not None and len(query.downloads) > 0:
-                        downloads = json.loads(query.downloads)
-                        
-                    if query.screenshots is not None and len(query.screenshots) > 0:
-                        screenshots = json.loads(query.screenshots)
-                        
-                    if query.installers is not None and len(query.installers) > 0:
-                        installers = json.loads(query.installers)
-                        
-                    # Extract query data into their own variables.
-                    viewUrl = query.viewUrl
-                    banner = query.banner
-                    
-                    categoryId = query.categoryId
-                    
-                    # Check category ID if skip null category is set to true.
-                    if self.skipNullCategory and (categoryId is None or categoryId < 1):
-                        debugMsg(self.cfg, 2, f"[{self.tag} A] Query '{query.query}' doesn't have a valid category ID. Skipping...")
-                        
-                        continue
-                    
-                    name = query.name
-                    ownerName = query.ownerName
-                    description = query.description
-                    descriptionShort = query.descriptionShort
-                    install = query.install
-                    
-                    nsfw = query.nsfw
-                    autoUpdate = query.autoUpdate
-                        
-                    debugMsg(self.cfg, 4, f"[{self.tag} A] Adding or updating mod with query '{query.query}'. ID => '{id}'. View URL => '{viewUrl}'. Category ID => '{categoryId}'. Banner => '{LimitText(banner)}'. Name => '{name}'. Owner Name => '{ownerName}'. Description => '{LimitText(description)}'. Description short => '{descriptionShort}'. Install => '{LimitText(install)}'. NSFW => '{nsfw}'. Auto Update => '{autoUpdate}'. Sources => '{sources}'. Downloads => '{downloads}'. Screenshots => '{screenshots}'. Installers => '{installers}'.")
-                    
-                    # Abort actual update if we're in test mode.
-                    if self.testMode:
-                        continue
-                    
-                    resp = self.api.UpdateOrAddMod(
-                        id = id,
-                        url = viewUrl,
-                        banner = banner,
-                        categoryId = categoryId,
-                        name = name,
-                        ownerName = ownerName,
-                        description = description,
-                        descriptionShort = descriptionShort,
-                        install = install,
-                        
-                        nsfw = nsfw,
-                        autoUpdate = autoUpdate,
-                        
-                        sources = sources,
-                        downloads = downloads,
-                        screenshots = screenshots,
-                        installers = installers
-                    )
-                    
-                    # Check response code.
-                    if resp.status_code != 200:
-                        debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' failed to update. Status code => {resp.status_code}. Response => '{resp.text}'.")
-                        
-                        continue
-                    
-                    # Load JSON object from response contents.
-                    jsonObj = json.loads(resp.text)
-                    
-                    if "data" not in jsonObj:
-                        debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' failed to update. No JSON key 'data' found in response.")
-                        
-                        continue
-                    
-                    # Retrieve data object.
-                    data = jsonObj["data"]
-                    
-                    # Attempt to retrieve ID and check.
-                    if "id" in data:
-                        id = int(data["id"])
-                    
-                    if id is None:
-                        debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' failed to update. Mod ID is None after add/update process.")
-                        
-                        continue
-                    
-                    # Set mod ID.
-                    query.modId = id
-                    
-                    # Set needs updating to false.
                     query.needsUpdating = False
                     
-                    # Check if we need to cleanup banners.
-                    if self.cleanupBanners:
-                        debugMsg(self.cfg, 5, f"[{self.tag} A] Cleaning up banner to save disk space.")
-                        
-                        query.banner = None
-                    
-                    # Save query.
                     query.save()
-                    
-                    debugMsg(self.cfg, 2, f"[{self.tag} A] Successfully inserted mod/query '{query.query}' (ID => {id})! Query also saved in database.")
                 except Exception as e:
-                    debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' failed to insert/update.")
+                    debugMsg(self.cfg, 0, f"[{self.tag} A] Failed to set unchanged query '{query.query}' to needsUpdating = False due to exception.")
                     debugMsg(self.cfg, 0, e)
                     
-                    continue
+                return None
+            
+            debugMsg(self.cfg, 4, f"[{self.tag} A] Only sending changed fields for query '{query.query}' => {fields}.")
+        
+        # Abort actual update if we're in test mode.
+        if self.testMode:
+            return None
+        
+        mod = {
+            "id": id,
+            "url": viewUrl,
+            "banner": banner,
+            "categoryId": categoryId,
+            "name": name,
+            "ownerName": ownerName,
+            "description": description,
+            "descriptionShort": descriptionShort,
+            "install": install,
+            
+            "nsfw": nsfw,
+            "autoUpdate": autoUpdate,
+            
+            "sources": sources,
+            "downloads": downloads,
+            "screenshots": screenshots,
+            "installers": installers
+        }
+        
+        if fields is not None:
+            mod = { key: value for key, value in mod.items() if key == "id" or key in fields }
+            
+        # Banners in the banner store are only read from disk when they're submitted.
+        if "banner" in mod and mod["banner"] is None and payload.bannerHash is not None:
+            mod["banner"] = self.banners.Encode(payload.bannerHash)
+            
+        return found, mod
+    
+    def AddQueryApi(self, query, payload, lookupResp = None):
+        try:
+            prepared = self.PrepareQueryApi(query, payload, lookupResp)
+            
+            if prepared is None:
+                return
+            
+            found, mod = prepared
+            
+            resp = self.api.UpdateOrAddMod(**mod)
         except Exception as e:
-            debugMsg(self.cfg, 0, f"[{self.tag} A] Error retrieving queries to add via API.")
+            debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' failed to insert/update.")
             debugMsg(self.cfg, 0, e)
+            
+            return
+        
+        self.FinishQueryApi(query, payload, found, mod, resp)
+        
+    def FinishQueryApi(self, query, payload, found: bool, mod: dict[str, any], resp):
+        # Handles the API's response to adding or updating a mod and saves the results.
+        id = mod["id"]
+        
+        try:
+            # Check response code.
+            if resp.status_code != 200:
+                debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' failed to update. Status code => {resp.status_code}. Response => '{resp.text}'.")
+                
+                # The mod may have been removed from Best Mods. Look it up again next time.
+                if id is not None:
+                    database.UncacheMod(self.url, query.query)
+                
+                return
+            
+            # Load JSON object from response contents.
+            jsonObj = json.loads(resp.text)
+            
+            if "data" not in jsonObj:
+                debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' failed to update. No JSON key 'data' found in response.")
+                
+                return
+            
+            # Retrieve data object.
+            data = jsonObj["data"]
+            
+            # Attempt to retrieve ID and check.
+            if "id" in data:
+                id = int(data["id"])
+            
+            if id is None:
+                debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' failed to update. Mod ID is None after add/update process.")
+                
+                return
+            
+            # Set mod ID.
+            query.modId = id
+            
+            # Set needs updating to false.
+            query.needsUpdating = False
+            
+            # Everything parsed so far has been submitted now.
+            payload.changedFields = []
+            
+            released = None
+            
+            # Check if we need to cleanup banners.
+            if self.cleanupBanners:
+                debugMsg(self.cfg, 5, f"[{self.tag} A] Cleaning up banner to save disk space.")
+                
+                payload.banner = None
+                
+                released = payload.bannerHash
+                payload.bannerHash = None
+                
+            # Save query and payload.
+            database.SaveQuery(query, payload)
+            
+            if released is not None:
+                self.banners.Release(released)
+            
+            # Cache the mod so the next submission skips the lookup. New mods take the auto update flag we sent unless the API tells us otherwise.
+            if "autoUpdate" in data:
+                remoteAutoUpdate = bool(data["autoUpdate"])
+            else:
+                # Existing mods only get here with auto updating enabled.
+                remoteAutoUpdate = True if found else mod.get("autoUpdate")
+                
+            if remoteAutoUpdate is not None:
+                try:
+                    database.CacheMod(self.url, query.query, id, remoteAutoUpdate)
+                except Exception as e:
+                    debugMsg(self.cfg, 1, f"[{self.tag} A] Failed to cache mod ID for query '{query.query}'.")
+                    debugMsg(self.cfg, 1, e)
+            
+            debugMsg(self.cfg, 2, f"[{self.tag} A] Successfully inserted mod/query '{query.query}' (ID => {id})! Query also saved in database.")
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} A] Query '{query.query}' failed to insert/update.")
+            debugMsg(self.cfg, 0, e)
+            
+            return
+    
+    def LookupMod(self, query, resp = None) -> tuple[bool, int, bool]:
+        # Returns whether the query's mod exists on Best Mods along with its ID and auto update flag. None on failure.
+        # A response from a batch lookup may be passed in place of looking the mod up here.
+        if resp is None:
+            cached = database.GetCachedMod(self.url, query.query, self.cfg["api"]["cacheTtl"])
+            
+            if cached is not None:
+                debugMsg(self.cfg, 4, f"[{self.tag} A] Using cached mod ID '{cached.modId}' for query '{query.query}'.")
+                
+                return True, cached.modId, bool(cached.autoUpdate)
+            
+            resp = self.api.GetMod(None, self.url, query.query)
+        
+        errGeneral = f"Failed to retrieve query => '{query.query}' from API"
+        
+        if resp is None:
+            debugMsg(self.cfg, 0, f"[{self.tag} A] {errGeneral}. Response is none.")
+            
+            return None
+        
+        if resp.status_code != 200:
+            debugMsg(self.cfg, 0, f"[{self.tag} A] {errGeneral}. Status code => {resp.status_code}.")
+            
+            return None
+        
+        try:
+            jsonObj = json.loads(resp.text)
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} A] {errGeneral}. Failed to load JSON due to following exception.")
+            debugMsg(self.cfg, 0, e)
+            
+            return None
+        
+        debugMsg(self.cfg, 3, f"[{self.tag} A] Found JSON response for query => '{query.query}'. Response => '{jsonObj}'.")
+        
+        if "data" not in jsonObj:
+            debugMsg(self.cfg, 0, f"[{self.tag} A] {errGeneral}. No 'data' object found in JSON response.")
+            
+            return None
+        
+        data = jsonObj["data"]
+        
+        if not data or len(data) < 1:
+            return False, None, False
+        
+        obj = data[0]
+        
+        # Retrieve ID.
+        id = None
+        
+        if "id" in obj:
+            id = int(obj["id"])
+            
+        # Retrieve auto update.
+        autoUpdate = False
+        
+        if "autoUpdate" in obj:
+            autoUpdate = bool(obj["autoUpdate"])
+            
+        if id is not None:
+            database.CacheMod(self.url, query.query, id, autoUpdate)
+            
+        return True, id, autoUpdate
     
-    def ParseMod(self, url: str, queryStr: str, resp: str):        
+    def BuildPage(self, resp: str) -> PageSource:
+        if isinstance(resp, PageSource) and resp.soup is not None:
+            return resp
+        
+        page = PageSource(resp)
+        page.soup = BeautifulSoup(resp, "lxml")
+        
+        return page
+    
+    def Soup(self, resp: str) -> BeautifulSoup:
+        # Reuse the parse tree built by ParseMod() if we have one. Otherwise, parse the raw string.
+        if isinstance(resp, PageSource) and resp.soup is not None:
+            return resp.soup
+        
+        return BeautifulSoup(resp, "lxml")
+    
+    def ParseMod(self, url: str, queryStr: str, resp: str, browser: bool = True):        
         debugMsg(self.cfg, 3, f"[{self.tag} P] Parsing query '{queryStr}'. Full URL => '{url}'")
         debugMsg(self.cfg, 6, f"[{self.tag} P] Base Parsed Resp => '{resp}'")
         
+        # Parse the page once and share the tree with every parse hook.
+        resp = self.BuildPage(resp)
+        
+        # Whether the page is already loaded in the web driver.
+        self.threadLocal.browserLoaded = browser
+        
         # Retrieve mod information.
-        ownerId, setOwnerId = self.ParseOwnerId(url, resp)
+        ownerId, setOwnerId = self.ParseField("ownerId", self.ParseOwnerId, url, resp)
                 
-        viewUrl, setViewUrl = self.ParseViewUrl(url, resp)
+        viewUrl, setViewUrl = self.ParseField("viewUrl", self.ParseViewUrl, url, resp)
         
-        categoryId, setCategoryId = self.ParseCategoryId(url, resp)
+        categoryId, setCategoryId = self.ParseField("categoryId", self.ParseCategoryId, url, resp)
         
         if not categoryId:
             debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse query '{queryStr}'. Category ID is Falsey.")
             
             return
         
-        name, setName = self.ParseName(url, resp)
-        ownerName, setOwnerName = self.ParseOwnerName(url, resp)
+        name, setName = self.ParseField("name", self.ParseName, url, resp)
+        ownerName, setOwnerName = self.ParseField("ownerName", self.ParseOwnerName, url, resp)
         
-        description, setDescription = self.ParseDescription(url, resp)
-        descriptionShort, setDescriptionShort = self.ParseDescriptionShort(url, resp)
-        install, setInstall = self.ParseInstall(url, resp)
+        description, setDescription = self.ParseField("description", self.ParseDescription, url, resp)
+        descriptionShort, setDescriptionShort = self.ParseField("descriptionShort", self.ParseDescriptionShort, url, resp)
+        install, setInstall = self.ParseField("install", self.ParseInstall, url, resp)
         
-        nsfw, setNsfw = self.ParseNsfw(url, resp)
-        autoUpdate, setAutoUpdate = self.ParseAutoUpdate(url, resp)
+        nsfw, setNsfw = self.ParseField("nsfw", self.ParseNsfw, url, resp)
+        autoUpdate, setAutoUpdate = self.ParseField("autoUpdate", self.ParseAutoUpdate, url, resp)
         
-        downloads, setDownloads = self.ParseDownloads(url, resp)
-        screenshots, setScreenshots = self.ParseScreenshots(url, resp)
-        installers, setInstallers = self.ParseInstallers(url, resp)
+        downloads, setDownloads = self.ParseField("downloads", self.ParseDownloads, url, resp)
+        screenshots, setScreenshots = self.ParseField("screenshots", self.ParseScreenshots, url, resp)
+        installers, setInstallers = self.ParseField("installers", self.ParseInstallers, url, resp)
         
-        banner, setBanner = self.ParseBanner(url, resp)
+        # Banners are downloaded once we know what we stored last time.
+        bannerUrl, setBannerUrl = self.ParseField("bannerUrl", self.ParseBannerUrl, url, resp)
         
         # Print results of content.
         debugMsg(self.cfg, 4, f"[{self.tag} P] View URL => {viewUrl} (set => {setViewUrl})")
         debugMsg(self.cfg, 4, f"[{self.tag} P] Category ID => {categoryId} (set => {setCategoryId})")
-        debugMsg(self.cfg, 4, f"[{self.tag} P] Banner => {LimitText(banner)} (set => {setBanner})")
+        debugMsg(self.cfg, 4, f"[{self.tag} P] Banner URL => {bannerUrl} (set => {setBannerUrl})")
         debugMsg(self.cfg, 4, f"[{self.tag} P] Name => {name} (set => {setName})")
         debugMsg(self.cfg, 4, f"[{self.tag} P] Owner Name => {ownerName} (set => {setOwnerName})")
         debugMsg(self.cfg, 4, f"[{self.tag} P] Owner ID => {ownerId} (set => {setOwnerId})")
@@ -715,6 +1638,9 @@ class Webscraper():
             
             return
         
+        # Retrieve mod contents stored outside of the query table.
+        payload = database.GetQueryPayload(self.url, queryStr)
+        
         # Retrieve current time.
         now = datetime.now()
         
@@ -729,12 +1655,30 @@ class Webscraper():
                     query.lastParsed = now
                     
                     query.save()
+                    
+                    self.threadLocal.stamped = True
                 except Exception as e:
                     debugMsg(self.cfg, 0, f"[{self.tag} P] Failed to save mod that is on avoid list due to exception.")
                     debugMsg(self.cfg, 0, e)
                 
                 return
         
+        # Make sure we have required fields set.
+        if not name or not description or not viewUrl:
+            debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse query '{queryStr}'. Aborting due to no name, description, or view URL set.")
+            
+            return
+        
+        # Download the banner only once we know the mod will be saved.
+        bannerMeta = (payload.bannerUrl, payload.bannerEtag, payload.bannerModified)
+        
+        if setBannerUrl:
+            banner, setBanner = self.FetchBanner(bannerUrl, payload)
+        else:
+            banner, setBanner = self.ParseField("banner", self.ParseBanner, url, resp)
+            
+        debugMsg(self.cfg, 4, f"[{self.tag} P] Banner => {LimitText(banner)} (set => {setBanner})")
+        
         # Assign values.
         if setViewUrl:
             query.viewUrl = viewUrl
@@ -742,8 +1686,14 @@ class Webscraper():
         if setCategoryId:
             query.categoryId = categoryId
         
-        if setBanner:
-            query.banner = banner
+        # Banners returned as bytes go to the banner store. Strings are legacy base64 banners kept in the payload.
+        bannerData = None
+        
+        if setBanner and isinstance(banner, bytes):
+            bannerData = banner
+            banner = BannerStore.Hash(bannerData)
+        elif setBanner:
+            payload.banner = banner
         
         if setName:
             query.name = name
@@ -752,13 +1702,13 @@ class Webscraper():
             query.ownerName = ownerName
         
         if setDescription:
-            query.description = description
+            payload.description = description
 
         if setDescriptionShort:
             query.descriptionShort = descriptionShort
         
         if setInstall:
-            query.install = install
+            payload.install = install
             
         if setNsfw:
             query.nsfw = nsfw
@@ -767,30 +1717,97 @@ class Webscraper():
             query.autoUpdate = autoUpdate
         
         if setDownloads:
-            query.downloads = json.dumps(downloads)
+            payload.downloads = downloads
         
         if setScreenshots:
-            query.screenshots = json.dumps(screenshots)
+            payload.screenshots = screenshots
         
         if setInstallers:
-            query.installers = json.dumps(installers)
-            
-        # Make sure we have required fields set.
-        if not name or not description or not viewUrl:
-            debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse query '{queryStr}'. Aborting due to no name, description, or view URL set.")
+            payload.installers = installers
             
-            return
-                        
-        # Update last parsed.
+        # Update last parsed. The query loaded fine so earlier timeouts are forgiven.
         query.lastParsed = now
+        query.timeouts = 0
+        query.retryAfter = None
+        
+        changed = self.ChangedFields(payload, {
+            "viewUrl": (viewUrl, setViewUrl),
+            "categoryId": (categoryId, setCategoryId),
+            "banner": (banner, setBanner),
+            "name": (name, setName),
+            "ownerName": (ownerName, setOwnerName),
+            "description": (description, setDescription),
+            "descriptionShort": (descriptionShort, setDescriptionShort),
+            "install": (install, setInstall),
+            "nsfw": (nsfw, setNsfw),
+            "autoUpdate": (autoUpdate, setAutoUpdate),
+            "downloads": (downloads, setDownloads),
+            "screenshots": (screenshots, setScreenshots),
+            "installers": (installers, setInstallers)
+        })
+        
+        # Only set needs updating to true if something changed since the last parse.
+        if len(changed) > 0:
+            query.needsUpdating = True
+            
+        debugMsg(self.cfg, 4, f"[{self.tag} P] Saving query '{queryStr}' to database! Last parsed => '{now}'. Changed fields => {changed}.")
+        
+        oldBannerHash = payload.bannerHash
         
-        # Set needs updating to true.
-        query.needsUpdating = True
+        if bannerData is not None and banner != oldBannerHash:
+            payload.bannerHash = self.banners.Put(bannerData)
+            payload.banner = None
+            
+        # Save mod. The payload is left alone if none of its contents changed.
+        savePayload = len(changed) > 0 or payload.bannerHash != oldBannerHash or (payload.bannerUrl, payload.bannerEtag, payload.bannerModified) != bannerMeta
         
-        debugMsg(self.cfg, 4, f"[{self.tag} P] Saving query '{queryStr}' to database! Last parsed => '{now}'.")
+        try:
+            database.SaveQuery(query, payload if savePayload else None)
+        except Exception:
+            # Nothing references the new banner if the mod wasn't saved.
+            if payload.bannerHash != oldBannerHash:
+                try:
+                    self.banners.Release(payload.bannerHash)
+                except Exception as e:
+                    debugMsg(self.cfg, 0, f"[{self.tag} P] Failed to release banner '{payload.bannerHash}'.")
+                    debugMsg(self.cfg, 0, e)
+                    
+            raise
         
-        # Save mod.
-        query.save()
+        self.threadLocal.stamped = True
+        
+        if len(changed) > 0:
+            self.notify(database.ADD_CHANNEL)
+            
+        # Drop our reference to the banner this mod used before.
+        if oldBannerHash is not None and payload.bannerHash != oldBannerHash:
+            self.banners.Release(oldBannerHash)
+        
+    def ChangedFields(self, payload, fields: dict[str, tuple[any, bool]]) -> list[str]:
+        # Compares parsed (value, set) pairs against the payload's fingerprints and returns the names of fields that changed.
+        fingerprints = dict(payload.fingerprints or {})
+        
+        changed: list[str] = []
+        
+        for field, (value, isSet) in fields.items():
+            if not isSet:
+                continue
+            
+            fingerprint = Fingerprint(value)
+            
+            if fingerprints.get(field) != fingerprint:
+                fingerprints[field] = fingerprint
+                
+                changed.append(field)
+                
+        payload.fingerprints = fingerprints
+        
+        # Keep fields changed by earlier parses that haven't been submitted yet.
+        pending = list(payload.changedFields or [])
+        
+        payload.changedFields = pending + [field for field in changed if field not in pending]
+        
+        return changed
         
     def ParseViewUrl(self, url: str, resp: str) -> (str, bool):
         return None, False
@@ -798,9 +1815,55 @@ class Webscraper():
     def ParseCategoryId(self, url: str, resp: str) -> (int, bool):
         return None, False
     
-    def ParseBanner(self, url: str, resp: str) -> (str, bool):
+    def ParseBanner(self, url: str, resp: str) -> (bytes, bool):
         return None, False
     
+    def ParseBannerUrl(self, url: str, resp: str) -> (str, bool):
+        return None, False
+    
+    def FetchBanner(self, url: str, payload) -> (bytes, bool):
+        # Downloads the banner at url unless it's the one we already have.
+        headers: dict[str, str] = {}
+        
+        known = url == payload.bannerUrl and (payload.fingerprints or {}).get("banner") is not None
+        
+        if known:
+            # Without validators, trust that the same URL is the same image.
+            if not payload.bannerEtag and not payload.bannerModified:
+                debugMsg(self.cfg, 5, f"[{self.tag} P] Banner URL '{url}' unchanged. Skipping download.")
+                
+                return None, False
+            
+            if payload.bannerEtag:
+                headers["If-None-Match"] = payload.bannerEtag
+                
+            if payload.bannerModified:
+                headers["If-Modified-Since"] = payload.bannerModified
+                
+        try:
+            resp = self.HttpGet(url, headers = headers)
+        except Exception as e:
+            debugMsg(self.cfg, 0, f"[{self.tag} P] Error downloading banner '{url}'.")
+            debugMsg(self.cfg, 0, e)
+            
+            return None, False
+        
+        if resp.status_code == 304:
+            debugMsg(self.cfg, 5, f"[{self.tag} P] Banner '{url}' not modified.")
+            
+            return None, False
+        
+        if resp.status_code != 200:
+            debugMsg(self.cfg, 1, f"[{self.tag} P] Banner image returned non-successful status code. Code => {resp.status_code}. Image => '{url}'.")
+            
+            return None, False
+        
+        payload.bannerUrl = url
+        payload.bannerEtag = resp.headers.get("ETag")
+        payload.bannerModified = resp.headers.get("Last-Modified")
+        
+        return resp.content, True
+    
     def ParseName(self, url: str, resp: str) -> (str, bool):
         return None, False
     
@@ -0,0 +1,83 @@
+import base64
+import json
+
+# Firefox preferences that stop the browser from loading each resource type.
+RESOURCE_PREFS = {
+    "images": {
+        "permissions.default.image": 2
+    },
+    "fonts": {
+        "gfx.downloadable_fonts.enabled": False,
+        "browser.display.use_document_fonts": 0
+    },
+    "media": {
+        "media.autoplay.default": 5,
+        "media.mediasource.enabled": False,
+        "media.peerconnection.enabled": False
+    },
+    "stylesheets": {
+        "permissions.default.stylesheet": 2
+    }
+}
+
+# Resource types that are blocked by proxying hosts instead of through preferences.
+THIRD_PARTY = "thirdParty"
+
+# Every resource type blockResources accepts.
+RESOURCE_TYPES = list(RESOURCE_PREFS.keys()) + [THIRD_PARTY]
+
+PAGE_LOAD_STRATEGIES = ["normal", "eager", "none"]
+
+# Blocked hosts are sent to a proxy nothing listens on so they fail right away.
+BLACKHOLE = "PROXY 127.0.0.1:9"
+
+def BlockingPrefs(resources: list[str]) -> dict[str, any]:
+    prefs = {}
+    
+    for resource in resources:
+        if resource == THIRD_PARTY:
+            continue
+            
+        if resource not in RESOURCE_PREFS:
+            raise ValueError(f"Unknown resource type '{resource}'.")
+            
+        prefs.update(RESOURCE_PREFS[resource])
+        
+    return prefs
+
+def PacScript(blockHosts: list[str], allowHosts: list[str] = None) -> str:
+    # Proxy auto-config that drops requests to blocked hosts and their subdomains. If allowHosts is set, everything else is dropped.
+    return f"""var blockHosts = {json.dumps(blockHosts)};
+var allowHosts = {json.dumps(allowHosts)};
+
+function matches(host, hosts) {{
+    for (var i = 0; i < hosts.length; i++) {{
+        if (host == hosts[i] || dnsDomainIs(host, "." + hosts[i]))
+            return true;
+    }}
+    
+    return false;
+}}
+
+function FindProxyForURL(url, host) {{
+    if (matches(host, blockHosts))
+        return "{BLACKHOLE}";
+        
+    if (allowHosts !== null && !matches(host, allowHosts))
+        return "{BLACKHOLE}";
+        
+    return "DIRECT";
+}}"""
+
+def PacPrefs(blockHosts: list[str], allowHosts: list[str] = None) -> dict[str, any]:
+    if len(blockHosts) < 1 and allowHosts is None:
+        return {}
+        
+    pac = base64.b64encode(PacScript(blockHosts, allowHosts).encode()).decode()
+    
+    return {
+        "network.proxy.type": 2,
+        "network.proxy.autoconfig_url": f"data:application/x-ns-proxy-autoconfig;base64,{pac}",
+        # Don't let blocked requests retry without the proxy.
+        "network.proxy.failover_direct": False
+    }
\ No newline at end of file
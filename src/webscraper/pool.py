@@ -0,0 +1,275 @@
+import time
+
+from queue import Queue
+from threading import Event, Lock, Thread
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from debugger import debugMsg
+from utils import ProcessTreeRss, KillProcessTree
+
+from selenium.webdriver import Firefox
+
+class DriverPool():
+    scraper = None
+    
+    size: int = 1
+    
+    drivers: Queue = None
+    lock: Lock = None
+    
+    # Recycle a driver after this many page loads or once its browser uses this many MBs. 0 disables.
+    recyclePages: int = 0
+    recycleRss: int = 0
+    
+    # Keep a launched driver ready so replacing one doesn't wait on a cold start.
+    warmSpare: bool = False
+    
+    # Kill drivers checked out for longer than this many seconds. 0 disables.
+    checkoutTimeout: int = 0
+    
+    def __init__(self, scraper, size: int = 1, recyclePages: int = None, recycleRss: int = None, warmSpare: bool = None, checkoutTimeout: int = None):
+        self.scraper = scraper
+        self.size = max(1, int(size))
+        
+        if recyclePages is not None:
+            self.recyclePages = max(0, int(recyclePages))
+            
+        if recycleRss is not None:
+            self.recycleRss = max(0, int(recycleRss))
+            
+        if warmSpare is not None:
+            self.warmSpare = warmSpare
+            
+        if checkoutTimeout is not None:
+            self.checkoutTimeout = max(0, int(checkoutTimeout))
+            
+        self.drivers = Queue()
+        self.lock = Lock()
+        
+        # Page loads per driver, keyed by id().
+        self.pages: dict[int, int] = {}
+        
+        # Launches spares and quits retired drivers off the parse path.
+        self.launcher = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "driver-launcher")
+        self.spare: Future = None
+        self.closed = False
+        
+        # Checked out drivers with their deadlines and the ones the watchdog killed, keyed by id().
+        self.deadlines: dict[int, tuple[Firefox, float]] = {}
+        self.expired: set[int] = set()
+        self.stopped = Event()
+        self.watchdog: Thread = None
+        
+        # Drivers lent outside the pool, keyed by id().
+        self.borrowed: dict[int, Firefox] = {}
+        
+    def Setup(self, first: Firefox = None):
+        # Allow the scraper's base driver to be the first member of the pool.
+        if first is not None:
+            self.drivers.put(first)
+            
+        while self.drivers.qsize() < self.size:
+            self.drivers.put(self.scraper.newDriver())
+            
+        self.prepareSpare()
+        
+        if self.checkoutTimeout > 0 and self.watchdog is None:
+            self.watchdog = Thread(target = self.watch, name = "driver-watchdog", daemon = True)
+            self.watchdog.start()
+        
+        debugMsg(self.scraper.cfg, 3, f"[{self.scraper.tag}] Driver pool ready with {self.size} driver(s).")
+        
+    def watch(self):
+        while not self.stopped.wait(1):
+            now = time.monotonic()
+            
+            with self.lock:
+                hung = [driver for driver, deadline in self.deadlines.values() if deadline <= now and id(driver) not in self.expired]
+                
+                for driver in hung:
+                    self.expired.add(id(driver))
+                    
+            for driver in hung:
+                # Killing the browser makes the blocked WebDriver call in the parse thread fail right away.
+                try:
+                    killed = KillProcessTree(driver.service.process.pid)
+                    
+                    debugMsg(self.scraper.cfg, 0, f"[{self.scraper.tag}] Killed web driver checked out for over {self.checkoutTimeout} seconds ({killed} processes).")
+                except Exception as e:
+                    debugMsg(self.scraper.cfg, 0, f"[{self.scraper.tag}] Failed to kill hung web driver.")
+                    debugMsg(self.scraper.cfg, 0, e)
+                    
+    def endCheckout(self, driver: Firefox):
+        # Stops the watchdog from tracking the driver. Expired drivers stay marked until they're retired.
+        if driver is None:
+            return
+            
+        with self.lock:
+            self.deadlines.pop(id(driver), None)
+            
+    def Expired(self, driver: Firefox) -> bool:
+        # Whether the watchdog killed the driver during its current checkout.
+        with self.lock:
+            return id(driver) in self.expired
+        
+    def prepareSpare(self):
+        with self.lock:
+            if not self.warmSpare or self.closed or self.spare is not None:
+                return
+                
+            self.spare = self.launcher.submit(self.scraper.newDriver)
+            
+    def launch(self) -> Firefox:
+        # Hand out the warm spare if there is one. Falls back to a cold start.
+        with self.lock:
+            spare = self.spare
+            self.spare = None
+            
+        driver = None
+        
+        if spare is not None:
+            try:
+                driver = spare.result()
+            except Exception as e:
+                debugMsg(self.scraper.cfg, 0, f"[{self.scraper.tag}] Warm spare web driver failed to launch.")
+                debugMsg(self.scraper.cfg, 0, e)
+                
+        if driver is None:
+            driver = self.scraper.newDriver()
+            
+        self.prepareSpare()
+        
+        return driver
+        
+    def retire(self, driver: Firefox):
+        with self.lock:
+            self.pages.pop(id(driver), None)
+            self.expired.discard(id(driver))
+        
+        try:
+            self.launcher.submit(self.quit, driver)
+        except RuntimeError:
+            # The launcher is shut down once the pool is closed.
+            self.quit(driver)
+            
+    def quit(self, driver: Firefox):
+        self.scraper.quitDriver(driver)
+            
+    def Replace(self, driver: Firefox, reason: str = "unhealthy") -> Firefox:
+        debugMsg(self.scraper.cfg, 1, f"[{self.scraper.tag}] Replacing {reason} web driver in pool.")
+        
+        self.retire(driver)
+        
+        newDriver = self.launch()
+        
+        with self.lock:
+            # Keep the scraper's base driver pointing at a live browser.
+            if self.scraper.baseDriver is driver:
+                self.scraper.baseDriver = newDriver
+                
+        return newDriver
+        
+    def Borrow(self) -> Firefox:
+        # A driver of its own for code outside the parse workers, e.g. the find stage. It never makes workers wait and isn't held to the per-mod deadline.
+        driver = self.launch()
+        
+        with self.lock:
+            self.borrowed[id(driver)] = driver
+            
+        return driver
+        
+    def Return(self, driver: Firefox):
+        with self.lock:
+            self.borrowed.pop(id(driver), None)
+            
+        self.retire(driver)
+        
+    def CountPage(self, driver: Firefox):
+        with self.lock:
+            self.pages[id(driver)] = self.pages.get(id(driver), 0) + 1
+            
+    def recycleReason(self, driver: Firefox) -> str:
+        # Returns why the driver should be recycled or None if it's fine to keep using.
+        if self.Expired(driver):
+            return "hung"
+            
+        if not self.scraper.autoRestartDriver:
+            return None
+            
+        pages = self.pages.get(id(driver), 0)
+        
+        if self.recyclePages > 0 and pages >= self.recyclePages:
+            return f"worn ({pages} pages)"
+            
+        if self.recycleRss > 0:
+            rss = ProcessTreeRss(driver.service.process.pid) // (1024 * 1024)
+            
+            if rss >= self.recycleRss:
+                return f"bloated ({rss} MBs)"
+                
+        return None
+        
+    @contextmanager
+    def Checkout(self, timeout: int = None):
+        driver = self.drivers.get(timeout = timeout)
+        
+        # The driver handed out. Its deadline must be cleared before it can be replaced.
+        checkedOut: Firefox = None
+        
+        try:
+            # Health check before handing the driver out.
+            if not self.scraper.checkDriver(driver):
+                driver = self.Replace(driver)
+                
+            checkedOut = driver
+            
+            if self.checkoutTimeout > 0:
+                with self.lock:
+                    self.deadlines[id(checkedOut)] = (checkedOut, time.monotonic() + self.checkoutTimeout)
+                    
+            yield driver
+        finally:
+            self.endCheckout(checkedOut)
+            
+            # The driver may have died while in use, even if the caller swallowed the error. Recycle worn out drivers too before anyone else checks them out.
+            try:
+                if not self.Expired(driver) and not self.scraper.checkDriver(driver):
+                    reason = "unhealthy"
+                else:
+                    reason = self.recycleReason(driver)
+                
+                if reason is not None:
+                    driver = self.Replace(driver, reason)
+            except Exception as e:
+                debugMsg(self.scraper.cfg, 0, f"[{self.scraper.tag}] Failed to replace web driver in pool.")
+                debugMsg(self.scraper.cfg, 0, e)
+                
+            # Always return the driver so the pool never shrinks.
+            self.drivers.put(driver)
+            
+    def Close(self):
+        self.stopped.set()
+        
+        with self.lock:
+            self.closed = True
+            
+            spare = self.spare
+            self.spare = None
+            
+            borrowed = list(self.borrowed.values())
+            self.borrowed = {}
+            
+        for driver in borrowed:
+            self.quit(driver)
+            
+        while not self.drivers.empty():
+            self.quit(self.drivers.get())
+            
+        if spare is not None:
+            try:
+                self.quit(spare.result())
+            except Exception:
+                pass
+                
+        self.launcher.shutdown(wait = True)
\ No newline at end of file
@@ -0,0 +1,100 @@
+import json
+import os
+
+from threading import Lock, get_ident
+
+from selenium.webdriver import Firefox
+
+class ProfileStore():
+    # Persistent Firefox profiles for a parser. A profile can only be open in one browser at a time so each driver gets its own slot directory.
+    path: str = None
+    
+    def __init__(self, path: str):
+        self.path = path
+        
+        self.lock = Lock()
+        self.free: list[str] = []
+        self.used: dict[int, str] = {}
+        self.slots = 0
+        
+    def Acquire(self) -> str:
+        with self.lock:
+            if len(self.free) > 0:
+                slot = self.free.pop(0)
+            else:
+                slot = os.path.join(self.path, str(self.slots))
+                
+                self.slots += 1
+                
+        os.makedirs(slot, exist_ok = True)
+        
+        # A killed browser leaves its profile lock behind. Slots are never shared so it's safe to remove.
+        for name in ["lock", ".parentlock"]:
+            lockPath = os.path.join(slot, name)
+            
+            if os.path.lexists(lockPath):
+                os.unlink(lockPath)
+                
+        return slot
+        
+    def Bind(self, driver: Firefox, slot: str):
+        with self.lock:
+            self.used[id(driver)] = slot
+            
+    def Free(self, slot: str):
+        with self.lock:
+            self.free.append(slot)
+            self.free.sort(key = lambda path: int(os.path.basename(path)))
+            
+    def Release(self, driver: Firefox):
+        with self.lock:
+            slot = self.used.pop(id(driver), None)
+            
+        if slot is not None:
+            self.Free(slot)
+            
+    def cookiesPath(self, slot: str) -> str:
+        return os.path.join(slot, "cookies.json")
+        
+    def SaveCookies(self, driver: Firefox, cookies: list[dict]):
+        # Each driver saves into its own slot so drivers never overwrite each other's cookies.
+        with self.lock:
+            slot = self.used.get(id(driver))
+            
+        if slot is None:
+            return
+        
+        path = self.cookiesPath(slot)
+        
+        # Write to a temporary file first so a crash never leaves half a cookie jar.
+        tmp = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+        
+        with open(tmp, "w") as f:
+            json.dump(cookies, f)
+            
+        os.replace(tmp, path)
+        
+    def LoadCookies(self) -> list[dict]:
+        # Merges the cookies saved by every slot. The most recently saved cookie wins.
+        paths = []
+        
+        try:
+            for name in os.listdir(self.path):
+                path = self.cookiesPath(os.path.join(self.path, name))
+                
+                if os.path.isfile(path):
+                    paths.append(path)
+        except FileNotFoundError:
+            return []
+        
+        cookies: dict[tuple, dict] = {}
+        
+        for path in sorted(paths, key = os.path.getmtime):
+            try:
+                with open(path) as f:
+                    for cookie in json.load(f):
+                        cookies[(cookie.get("domain"), cookie.get("path", "/"), cookie["name"])] = cookie
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+                
+        return list(cookies.values())
\ No newline at end of file
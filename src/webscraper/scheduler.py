@@ -0,0 +1,145 @@
+import time
+
+from contextlib import contextmanager
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from random import uniform
+from threading import Lock, BoundedSemaphore
+from urllib.parse import urlparse
+
+from debugger import debugMsg
+
+from requests import Session, Response
+
+class HostState():
+    def __init__(self, burst: int, concurrency: int):
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blockedUntil = 0.0
+        self.slots = BoundedSemaphore(concurrency)
+        
+class HostScheduler():
+    # Paces requests per host with a token bucket and caps how many are in flight at once.
+    cfg: dict[str, any] = None
+    
+    rate: float = 2.0
+    burst: int = 4
+    concurrency: int = 4
+    jitter: float = 0.25
+    
+    # How long to back off after a 429 without a Retry-After header.
+    defaultBackoff: int = 60
+    
+    def __init__(self, cfg: dict[str, any], rate: float = None, burst: int = None, concurrency: int = None, jitter: float = None):
+        self.cfg = cfg
+        
+        if rate is not None:
+            self.rate = max(0.001, float(rate))
+            
+        if burst is not None:
+            self.burst = max(1, int(burst))
+            
+        if concurrency is not None:
+            self.concurrency = max(1, int(concurrency))
+            
+        if jitter is not None:
+            self.jitter = max(0.0, float(jitter))
+            
+        self.hosts: dict[str, HostState] = {}
+        self.lock = Lock()
+        
+    def host(self, url: str) -> tuple[str, HostState]:
+        host = urlparse(url).netloc.lower()
+        
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostState(self.burst, self.concurrency)
+                
+            return host, self.hosts[host]
+        
+    def take(self, state: HostState) -> float:
+        # Takes a token if one is available. Otherwise, returns how long to wait for one.
+        with self.lock:
+            now = time.monotonic()
+            
+            if state.blockedUntil > now:
+                return state.blockedUntil - now
+            
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate)
+            state.updated = now
+            
+            if state.tokens >= 1:
+                state.tokens -= 1
+                
+                return 0
+            
+            return (1 - state.tokens) / self.rate
+        
+    @contextmanager
+    def Slot(self, url: str):
+        host, state = self.host(url)
+        
+        state.slots.acquire()
+        
+        try:
+            while True:
+                wait = self.take(state)
+                
+                if wait <= 0:
+                    break
+                
+                debugMsg(self.cfg, 7, f"[Scheduler] Waiting {wait:.2f} seconds for '{host}'.")
+                
+                time.sleep(wait)
+                
+            # Spread requests out so they don't line up on token refills.
+            if self.jitter > 0:
+                time.sleep(uniform(0, self.jitter))
+                
+            yield
+        finally:
+            state.slots.release()
+            
+    def Backoff(self, url: str, seconds: float):
+        host, state = self.host(url)
+        
+        debugMsg(self.cfg, 1, f"[Scheduler] Backing off '{host}' for {seconds:.0f} seconds.")
+        
+        with self.lock:
+            state.blockedUntil = max(state.blockedUntil, time.monotonic() + seconds)
+            
+    def Observe(self, url: str, resp: Response):
+        # Honors rate limit responses from the host.
+        if resp.status_code not in [429, 503]:
+            return
+        
+        delay = RetryAfter(resp.headers.get("Retry-After"))
+        
+        if delay is None and resp.status_code == 429:
+            delay = self.defaultBackoff
+            
+        if delay is not None:
+            self.Backoff(url, delay)
+            
+    def Get(self, session: Session, url: str, **kwargs) -> Response:
+        with self.Slot(url):
+            resp = session.get(url, **kwargs)
+            
+        self.Observe(url, resp)
+        
+        return resp
+    
+def RetryAfter(value: str) -> float | None:
+    # Retry-After is either an amount of seconds or an HTTP date.
+    if not value:
+        return None
+    
+    value = value.strip()
+    
+    if value.isdigit():
+        return float(value)
+    
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now().astimezone()).total_seconds())
+    except Exception:
+        return None
\ No newline at end of file
@@ -1,4 +1,5 @@
 from ...base import Webscraper as BaseWebscraper
+from ...sitemap import ReadSitemap
 
 from debugger import debugMsg
 
@@ -14,72 +15,56 @@ import re
 
 from utils import ConvertToUrl
 
-import base64
-
-import requests
-
 class Webscraper(BaseWebscraper):
     name = "Best Mods"
     url = "bestmods.io"
     
+    # Mod pages are server-rendered. Only the installers menu needs JavaScript.
+    httpFirst = True
+    browserFields = ["installers"]
+    
+    carouselXpath = "//li[contains(@class, 'react-multi-carousel-item')]"
+    installersXpath = "//button[contains(@class, 'btn-secondary')]"
+    
     def BaseWait(self):
         # Wait until we have coursel items.
-        waitXpath = "//li[contains(@class, 'react-multi-carousel-item')]"
-        
         WebDriverWait(self.driver, 3).until(
-            EC.presence_of_element_located((By.XPATH, waitXpath))
+            EC.presence_of_element_located((By.XPATH, self.carouselXpath))
         )
+        
+    def HttpWait(self, url, resp):
+        # Same check as BaseWait() against the server-rendered HTML.
+        return self.HasXpath(resp, self.carouselXpath)
     
-    async def GatherQueries(self):
-        queries: list[str] = []
+    def NeedsBrowser(self, url, field, resp):
+        # Only load the browser for installers if the page has an installers button.
+        if field == "installers":
+            return self.HasXpath(resp, self.installersXpath)
         
+        return True
+    
+    async def GatherQueries(self):
         debugMsg(self.cfg, 3, f"[{self.tag} F] Sending request to sitemap.")
         
-        # Send request to sitemap.
-        try:
-            reqUrl = f"{self.protocol}://{self.url}/sitemap.xml"
-            
-            self.driver.get(reqUrl)
-            
-            # Wait until <url> elements are available.
-            WebDriverWait(self.driver, 5).until(EC.presence_of_element_located((By.TAG_NAME, "url")))
-            
-            soup = BeautifulSoup(self.driver.page_source, "lxml")
-            
-            if soup is None:
-                debugMsg(self.cfg, 0, f"[{self.tag} F] Soup object is None.")
+        reqUrl = f"{self.protocol}://{self.url}/sitemap.xml"
+        
+        return self.ModQueries(ReadSitemap(self.cfg, self.session, reqUrl, scheduler = self.scheduler))
+    
+    def ModQueries(self, entries):
+        for url, lastmod in entries:
+            if "/mod/" not in url:
+                debugMsg(self.cfg, 4, f"[{self.tag} F] URL '{url}' doesn't contain /mod/. Ignoring...")
                 
-                return
+                continue
             
-            urls = []
+            debugMsg(self.cfg, 4, f"[{self.tag} F] Found URL => {url}")
             
-            # Retrieve all 'url' elements.
-            eles = soup.findAll("url")
+            # Strip URL.
+            query = url.replace(f"{self.protocol}://{self.url}", "")
             
-            # Loop through each element and extract 'loc' and append it to 'urls' list.
-            for ele in eles:
-                urls.append(ele.loc.text)
-                
-            for url in urls:
-                if "/mod/" not in url:
-                    debugMsg(self.cfg, 4, f"[{self.tag} F] URL '{url}' doesn't contain /mod/. Ignoring...")
-                    
-                    continue
-                
-                debugMsg(self.cfg, 4, f"[{self.tag} F] Found URL => {url}")
-                
-                # Strip URL.
-                query = url.replace(f"{self.protocol}://{self.url}", "")
-                
-                debugMsg(self.cfg, 4, f"[{self.tag} F] Query => {query}")
-                
-                # Add to queries list.
-                queries.append(query)
-        except Exception as e:
-            debugMsg(self.cfg, 0, f"[{self.tag} F] Error sending request to sitemap.")
-            debugMsg(self.cfg, 0, e)
+            debugMsg(self.cfg, 4, f"[{self.tag} F] Query => {query}")
             
-        return queries
+            yield query, lastmod
         
     def ParseCategoryId(self, url, resp):
         id = None
@@ -115,7 +100,7 @@ class Webscraper(BaseWebscraper):
         viewUrl = None
     
         try:
-            soup = BeautifulSoup(resp, "html.parser")
+            soup = self.Soup(resp)
             
             # Get title.
             div = soup.find("div", class_="flex flex-wrap justify-center gap-4")
@@ -144,59 +129,50 @@ class Webscraper(BaseWebscraper):
         
         return viewUrl, True
     
-    def ParseBanner(self, url, resp):
-        banner = None
+    def ParseBannerUrl(self, url, resp):
+        bannerUrl = None
         
         try:
-            soup = BeautifulSoup(resp, "html.parser")
+            soup = self.Soup(resp)
             
             # We need to find all li elements with carousel class.
             liEles = soup.findAll("li", class_="react-multi-carousel-item")
                         
             if liEles is None or len(liEles) < 1:
-                debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse banner. 'liEles' is None.")
+                debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse banner URL. 'liEles' is None.")
                 
-                return banner, False
+                return bannerUrl, False
                         
             # Get first screenshot.
             imgEle = liEles[0].find("img")
             
             if imgEle is None:
-                debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse banner. 'imgEle' is None.")
+                debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse banner URL. 'imgEle' is None.")
                 
-                return banner, False
+                return bannerUrl, False
                         
             # Extract source image.
             imgSrc = imgEle.get("src")
             
             if not imgSrc.startswith("https") and not imgSrc.startswith("http"):
-                debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse banner. Image source doesn't contain 'http' or 'https'.")
+                debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse banner URL. Image source doesn't contain 'http' or 'https'.")
                 
-                return banner, False
+                return bannerUrl, False
                         
-            # Get image contents.
-            imgResp = requests.get(imgSrc)
-            
-            if imgResp.status_code == 200:
-                imgContents = imgResp.content
-            
-                # Convert contents to base64.
-                banner = base64.b64encode(imgContents).decode("utf-8")
-            else:
-                debugMsg(self.cfg, 1, f"[{self.tag} P] Banner image returned non-successful status code. Code => {imgResp.status_code}. Image => '{imgSrc}'.")
+            bannerUrl = imgSrc
         except Exception as e:
-            debugMsg(self.cfg, 0, f"[{self.tag} P] Error to parse banner due to exception.")
+            debugMsg(self.cfg, 0, f"[{self.tag} P] Error to parse banner URL due to exception.")
             debugMsg(self.cfg, 0, e)
             
-            return banner, False
+            return bannerUrl, False
         
-        return banner, True
+        return bannerUrl, True
         
     def ParseName(self, url, resp):
         name = None
         
         try:
-            soup = BeautifulSoup(resp, "html.parser")
+            soup = self.Soup(resp)
             
             div = soup.find("div", class_="flex flex-wrap justify-center gap-4")
             
@@ -225,7 +201,7 @@ class Webscraper(BaseWebscraper):
         ownerName = None
         
         try:
-            soup = BeautifulSoup(resp, "html.parser")
+            soup = self.Soup(resp)
             
             div = soup.find("div", class_="flex flex-col gap-2")
             
@@ -268,7 +244,7 @@ class Webscraper(BaseWebscraper):
         description = None
         
         try:
-            soup = BeautifulSoup(resp, "html.parser")
+            soup = self.Soup(resp)
             
             div = soup.find("div", class_="markdown")
             
@@ -289,23 +265,18 @@ class Webscraper(BaseWebscraper):
         install = None
         
         try:
-            # We need to parse the /install page.
-            self.driver.get(f"{url}/install")
-            
-            # Wait until H2 element with "Installation" is available.
+            # We need to parse the /install page and wait until H2 element with "Installation" is available.
             waitXpath = "//div[contains(@class, 'flex') and contains(@class, 'flex-col')]/h2[text() = 'Installation']"
             
             try:
-                WebDriverWait(self.driver, 2).until(
-                    EC.presence_of_element_located((By.XPATH, waitXpath))
-                )
+                page = self.FetchSubPage(f"{url}/install", waitXpath)
             except Exception as e:
                 debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse install. Couldn't find 'h2' tag with 'Installation' text.")
                 debugMsg(self.cfg, 4, e)
                 
                 return install, False
             
-            soup  = BeautifulSoup(self.driver.page_source, "html.parser")
+            soup = self.Soup(page)
             
             div = soup.find("div", class_="markdown")
             
@@ -327,23 +298,18 @@ class Webscraper(BaseWebscraper):
         downloads = None
         
         try:
-            # We need to parse the /downloads page.
-            self.driver.get(f"{url}/downloads")
-            
-            # Wait until H2 element with "Downloads" is available.
+            # We need to parse the /downloads page and wait until H2 element with "Downloads" is available.
             waitXpath = "//div[contains(@class, 'flex') and contains(@class, 'flex-col')]/h2[text() = 'Downloads']"
             
             try:
-                WebDriverWait(self.driver, 2).until(
-                    EC.presence_of_element_located((By.XPATH, waitXpath))
-                )
+                page = self.FetchSubPage(f"{url}/downloads", waitXpath)
             except Exception as e:
                 debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse downloads. Couldn't find 'h2' tag with 'Downloads' text.")
                 debugMsg(self.cfg, 4, e)
                 
                 return downloads, False
             
-            soup = BeautifulSoup(self.driver.page_source, "html.parser")
+            soup = self.Soup(page)
             
             # Retrieve all dividers with flex flex-col gap-2.
             divs = soup.find_all("div", class_="flex flex-col gap-2")
@@ -392,7 +358,7 @@ class Webscraper(BaseWebscraper):
         screenshots = None
         
         try:                
-            soup = BeautifulSoup(resp, "html.parser")
+            soup = self.Soup(resp)
             
             # We need to find all li elements with carousel class.
             liEles = soup.findAll("li", class_="react-multi-carousel-item")
@@ -438,10 +404,8 @@ class Webscraper(BaseWebscraper):
         
         try:
             # We need to wait for installer button with two-second timeout.
-            btnXpath = "//button[contains(@class, 'btn-secondary')]"
-            
             try:
-                btn = WebDriverWait(self.driver, 2).until(EC.element_to_be_clickable((By.XPATH, btnXpath)))
+                btn = WebDriverWait(self.driver, 2).until(EC.element_to_be_clickable((By.XPATH, self.installersXpath)))
             except Exception as e:
                 debugMsg(self.cfg, 4, f"[{self.tag} P] Failed to parse installers. Unable to find clickable installers button.")
                 debugMsg(self.cfg, 4, e)
@@ -455,7 +419,7 @@ class Webscraper(BaseWebscraper):
 
             btn.click()
             
-            soup = BeautifulSoup(self.driver.page_source, "html.parser")
+            soup = BeautifulSoup(self.driver.page_source, "lxml")
             
             # Retrieve install menu.
             divMenu = soup.find("div", class_="origin-top-right break-all absolute right-0 mt-2 w-44 min-w-full top-[100%] z-30 rounded-b p-2 bg-bestmods-3")
@@ -0,0 +1,129 @@
+import re
+import tempfile
+import zlib
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+from lxml import etree
+from requests import Session
+
+from debugger import debugMsg
+
+from .scheduler import HostScheduler
+
+# Sitemaps larger than this many bytes are spooled to disk while they're parsed.
+SPOOL_SIZE = 8 * 1024 * 1024
+
+# W3C datetime (https://www.w3.org/TR/NOTE-datetime) from a year down to fractional seconds. Also allows a space before the time, "+hhmm" offsets and lowercase letters seen in the wild.
+LASTMOD_RE = re.compile(r"^(\d{4})(?:-(\d{2})(?:-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d+))?)?)?)?)?\s*(Z|[+-]\d{2}(?::?\d{2})?)?$", re.IGNORECASE)
+
+def ParseLastmod(text: str, cfg: dict[str, any] = None) -> datetime | None:
+    if not text:
+        return None
+        
+    text = text.strip()
+    
+    match = LASTMOD_RE.match(text)
+    
+    try:
+        if match is not None:
+            year, month, day, hour, minute, second, fraction, offset = match.groups()
+            
+            lastmod = datetime(int(year), int(month or 1), int(day or 1), int(hour or 0), int(minute or 0), int(second or 0), int((fraction or "0")[:6].ljust(6, "0")))
+            
+            if offset is not None:
+                if offset.upper() == "Z":
+                    lastmod = lastmod.replace(tzinfo = timezone.utc)
+                else:
+                    digits = offset[1:].replace(":", "")
+                    delta = timedelta(hours = int(digits[:2]), minutes = int(digits[2:] or 0))
+                    
+                    lastmod = lastmod.replace(tzinfo = timezone(delta if offset[0] == "+" else -delta))
+        else:
+            # Some sitemaps use RFC 2822 dates like HTTP headers do.
+            lastmod = parsedate_to_datetime(text)
+    except (TypeError, ValueError):
+        if cfg is not None:
+            debugMsg(cfg, 4, f"[Sitemap] Couldn't parse lastmod '{text}'. Ignoring it so the entry isn't expired.")
+            
+        return None
+        
+    # Convert to local time without a time zone to match our database timestamps.
+    if lastmod.tzinfo is not None:
+        lastmod = lastmod.astimezone().replace(tzinfo=None)
+        
+    return lastmod
+
+def fetchSitemap(session: Session, url: str, timeout: int, scheduler: HostScheduler = None):
+    # Downloads a sitemap into a spooled temporary file. The scheduler slot is only held for the download.
+    slot = scheduler.Slot(url) if scheduler is not None else nullcontext()
+    
+    body = tempfile.SpooledTemporaryFile(max_size = SPOOL_SIZE)
+    
+    try:
+        with slot, session.get(url, stream = True, timeout = timeout) as resp:
+            if scheduler is not None:
+                scheduler.Observe(url, resp)
+                
+            resp.raise_for_status()
+            
+            decompressor = None
+            
+            for chunk in resp.iter_content(chunk_size = 65536):
+                # Sitemaps served as .xml.gz files are gzipped on top of any transfer encoding.
+                if decompressor is None:
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b"\x1f\x8b" else False
+                    
+                if decompressor:
+                    chunk = decompressor.decompress(chunk)
+                    
+                body.write(chunk)
+    except Exception:
+        body.close()
+        
+        raise
+        
+    body.seek(0)
+    
+    return body
+
+def ReadSitemap(cfg: dict[str, any], session: Session, url: str, timeout: int = 30, maxDepth: int = 3, scheduler: HostScheduler = None):
+    # Streams (loc, lastmod) pairs from a sitemap. Sitemap index files are followed up to maxDepth levels.
+    debugMsg(cfg, 4, f"[Sitemap] Reading sitemap '{url}'.")
+    
+    children: list[str] = []
+    
+    # The consumer does database work between batches. Parsing from our own copy keeps the host slot and connection free meanwhile.
+    with fetchSitemap(session, url, timeout, scheduler) as body:
+        parser = etree.XMLPullParser(events = ("end",), tag = ("{*}url", "{*}sitemap"))
+        
+        for chunk in iter(lambda: body.read(65536), b""):
+            parser.feed(chunk)
+            
+            for _, ele in parser.read_events():
+                loc = ele.findtext("{*}loc")
+                
+                if loc:
+                    loc = loc.strip()
+                    
+                    if etree.QName(ele).localname == "sitemap":
+                        children.append(loc)
+                    else:
+                        yield loc, ParseLastmod(ele.findtext("{*}lastmod"), cfg)
+                        
+                # Free elements we're done with so memory stays flat on large sitemaps.
+                ele.clear()
+                
+                while ele.getprevious() is not None:
+                    del ele.getparent()[0]
+                    
+        parser.close()
+        
+    for child in children:
+        if maxDepth < 1:
+            debugMsg(cfg, 1, f"[Sitemap] Not following sitemap '{child}'. Maximum depth reached.")
+            
+            continue
+            
+        yield from ReadSitemap(cfg, session, child, timeout, maxDepth - 1, scheduler)
\ No newline at end of file
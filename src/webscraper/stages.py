@@ -0,0 +1,41 @@
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from threading import Lock
+from typing import Callable
+
+class StageExecutors():
+    # Gives each pipeline stage its own thread so blocking Selenium, peewee and requests calls in one stage don't stall the event loop or the other stages.
+    def __init__(self, context: Callable = None):
+        # Entered around every call, e.g. to check out a database connection for the stage's thread.
+        self.context = context or nullcontext
+        
+        self.executors: dict[str, ThreadPoolExecutor] = {}
+        self.lock = Lock()
+        
+    def executor(self, stage: str) -> ThreadPoolExecutor:
+        with self.lock:
+            if stage not in self.executors:
+                # One worker per stage keeps a stage's cycles in order.
+                self.executors[stage] = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = f"stage-{stage}")
+                
+            return self.executors[stage]
+            
+    def call(self, func: Callable, *args):
+        with self.context():
+            return func(*args)
+            
+    async def Run(self, stage: str, func: Callable, *args):
+        loop = asyncio.get_running_loop()
+        
+        return await loop.run_in_executor(self.executor(stage), self.call, func, *args)
+        
+    def Shutdown(self, wait: bool = True):
+        with self.lock:
+            executors = list(self.executors.values())
+            
+            self.executors = {}
+            
+        for executor in executors:
+            executor.shutdown(wait = wait, cancel_futures = True)
\ No newline at end of file